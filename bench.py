@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import logging
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Эндпоинты по умолчанию: "МЕТОД путь"
+DEFAULT_ENDPOINTS = [
+    "GET /power",
+    "GET /volume",
+    "GET /mute",
+    "GET /volume/up",
+    "GET /volume/down",
+    "GET /volume/set/20",
+    "POST /command/audio/getStatus",
+    "POST /command/tv/getChannelList",
+]
+
+
+def percentile(samples, q):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[q - 1]
+
+
+async def run(client, endpoints, concurrency, total, duration):
+    """Нагрузка: concurrency воркеров по кругу обходят endpoints."""
+    latencies = {endpoint: [] for endpoint in endpoints}
+    errors = {endpoint: 0 for endpoint in endpoints}
+    counter = iter(range(total)) if total else None
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def worker(offset):
+        i = offset
+        while True:
+            if counter is not None and next(counter, None) is None:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            endpoint = endpoints[i % len(endpoints)]
+            i += 1
+            method, path = endpoint.split(" ", 1)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies[endpoint].append(time.perf_counter() - start)
+            if not ok:
+                errors[endpoint] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def report(latencies, errors, elapsed):
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"Запросов: {total}, время: {elapsed:.2f} с, пропускная способность: {total / elapsed:.1f} rps")
+    print(f"{'эндпоинт':40} {'n':>7} {'ошибки':>7} {'rps':>8} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8}")
+    for endpoint, samples in latencies.items():
+        if not samples:
+            continue
+        samples.sort()
+        p50, p95, p99 = (percentile(samples, q) * 1000 for q in (50, 95, 99))
+        print(
+            f"{endpoint:40} {len(samples):>7} {errors[endpoint]:>7} {len(samples) / elapsed:>8.1f} "
+            f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f}"
+        )
+
+
+async def main(args):
+    mock = None
+    if args.mock is not None:
+        # Мок-телевизор в отдельном процессе, чтобы не делить с приложением цикл событий
+        mock = subprocess.Popen(
+            [sys.executable, "ws_test.py", "--log-level", "WARNING", *shlex.split(args.mock)]
+        )
+        await asyncio.sleep(1)
+
+    try:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+        else:
+            from main import app
+            client = httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=args.timeout
+            )
+
+        async with client:
+            if args.warmup:
+                await run(client, args.endpoints, 1, len(args.endpoints), 0)
+            latencies, errors, elapsed = await run(
+                client, args.endpoints, args.concurrency, args.requests, args.duration
+            )
+        report(latencies, errors, elapsed)
+    finally:
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест FastAPI-приложения на мок-телевизоре")
+    parser.add_argument("--url", help="адрес запущенного сервиса; по умолчанию приложение в процессе")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=0, help="всего запросов (по умолчанию 1000, если не задан --duration)")
+    parser.add_argument("--duration", type=float, default=0, help="длительность, с (0 — ограничение по числу)")
+    parser.add_argument("--endpoint", dest="endpoints", action="append",
+                        help='эндпоинт "МЕТОД путь", можно несколько раз')
+    parser.add_argument("--mock", nargs="?", const="", default=None,
+                        help='запустить ws_test.py с аргументами, например --mock "--latency 0.05"')
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false")
+    parser.add_argument("--timeout", type=float, default=30)
+    args = parser.parse_args(argv)
+    args.endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    if not args.requests and not args.duration:
+        args.requests = 1000
+    return args
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    asyncio.run(main(parse_args()))
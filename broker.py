@@ -0,0 +1,298 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+
+import websockets
+from dotenv import load_dotenv
+
+import capture
+import logs
+from catalog import READ_PREFIXES
+from coalesce import VolumeCoalescer
+from commands import CommandEnum
+from scheduler import TVBusyError
+from websocket import LGWebOSClient, TVTimeoutError, TVUnavailableError, command_label, encode_payload, frame_prefix
+
+load_dotenv()
+
+# Unix-сокет брокера: если задан, воркеры uvicorn ходят к телевизорам через него
+TV_BROKER_SOCKET = os.getenv("TV_BROKER_SOCKET")
+# Сколько секунд известная брокеру громкость годится для расчёта шага без запроса
+STATE_MAX_AGE = float(os.getenv("STATE_MAX_AGE") or 30)
+
+# Кадр: длина тела (4 байта, big-endian) и тело — сообщение ssap в UTF-8
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+# Запрос только к брокеру: относительный шаг громкости {"delta": n}, ответ {"volume": итог}
+VOLUME_STEP_URI = "broker://volumeStep"
+
+# Склейка шагов громкости в брокере: по одной на телевизор для всех воркеров
+coalescers = {}
+
+
+def get_coalescer(tv):
+    if tv not in coalescers:
+        coalescers[tv] = VolumeCoalescer(tv, STATE_MAX_AGE)
+    return coalescers[tv]
+
+
+def is_read_only(uri):
+    return uri.rsplit("/", 1)[-1].startswith(READ_PREFIXES)
+
+
+class BrokerSocket:
+    """Соединение с брокером по Unix-сокету с интерфейсом websocket: send, async for, close."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, path, timeout):
+        reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), timeout)
+        return cls(reader, writer)
+
+    async def send(self, message):
+        data = message.encode()
+        if self.writer.is_closing():
+            raise websockets.exceptions.ConnectionClosedError(None, None)
+        self.writer.write(FRAME_HEADER.pack(len(data)) + data)
+        try:
+            await self.writer.drain()
+        except ConnectionError as e:
+            raise websockets.exceptions.ConnectionClosedError(None, None) from e
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            (size,) = FRAME_HEADER.unpack(await self.reader.readexactly(FRAME_HEADER.size))
+            if size > MAX_FRAME_SIZE:
+                raise ConnectionError(f"Слишком большой кадр: {size} байт")
+            return (await self.reader.readexactly(size)).decode()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            raise StopAsyncIteration
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+class BrokeredClient(LGWebOSClient):
+    """Клиент телевизора в воркере: вместо своего WebSocket — соединение с брокером.
+
+    Сопряжение, подписки и очередь команд к телевизору ведёт брокер; воркер получает
+    от него ответы и push-обновления состояния в том же формате ssap.
+    """
+
+    def __init__(self, socket_path, **kwargs):
+        super().__init__(**kwargs)
+        self.socket_path = socket_path
+
+    async def _transport(self):
+        logging.info("🔌 Подключение к брокеру %s (%s)", self.socket_path, self.name)
+        return await BrokerSocket.connect(self.socket_path, self.connect_timeout)
+
+    def _register_message(self):
+        return {"type": "register", "id": "register_0", "payload": {"device": self.name}}
+
+    def _frame(self, uri, request_id, payload, deadline):
+        # Брокер получает оставшийся срок запроса и не держит команду дольше, чем ждёт воркер
+        if deadline is None:
+            return super()._frame(uri, request_id, payload, deadline)
+        remaining = deadline - asyncio.get_running_loop().time()
+        return f'{frame_prefix(uri)}{request_id}", "timeout": {remaining:.3f}, "payload": {encode_payload(payload)}}}'
+
+    def _resolve(self, future, message, data):
+        if data.get("type") != "broker_error":
+            return super()._resolve(future, message, data)
+        # Ошибки брокера превращаются в те же исключения, что и при прямом подключении
+        if data["error"] == "busy":
+            future.set_exception(TVBusyError(data["message"], data["retry_after"]))
+        elif data["error"] == "unavailable":
+            future.set_exception(TVUnavailableError(data["message"], data["retry_after"]))
+        elif data["error"] == "timeout":
+            future.set_exception(TVTimeoutError(data["message"]))
+        else:
+            future.set_exception(ConnectionError(data["message"]))
+
+
+class BrokeredVolumeCoalescer(VolumeCoalescer):
+    """Склейка шагов громкости в воркере: брокеру уходит сумма шагов, а не итоговая громкость.
+
+    Итог считает брокер от своего состояния телевизора, общего для всех воркеров;
+    абсолютная громкость от копии состояния воркера теряла бы шаги соседних воркеров.
+    """
+
+    async def _apply(self, delta):
+        response = await self.tv.send_command("VOLUME_STEP", VOLUME_STEP_URI, {"delta": delta})
+        volume = json.loads(response)["payload"]["volume"]
+        self.tv.update_state(CommandEnum.VOLUME_STATUS.uri, {"volume": volume})
+        return volume
+
+
+class WorkerSession:
+    """Соединение одного воркера с брокером.
+
+    Запросы воркера выполняются через общий клиент телевизора (с его очередью и
+    объединением одинаковых чтений), обновления состояния пересылаются по подпискам
+    воркера. При разрыве соединения с телевизором брокер закрывает сессию, и воркер
+    переподключается так же, как к самому телевизору.
+    """
+
+    def __init__(self, registry, socket):
+        self.registry = registry
+        self.socket = socket
+        self.tv = None
+        # uri -> id подписки воркера
+        self.subscriptions = {}
+        self.tasks = set()
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _reply(self, data):
+        try:
+            await self.socket.send(json.dumps(data))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def _register(self, data):
+        """Выбор телевизора; регистрация удаётся, только если брокер к нему подключен."""
+        try:
+            tv = self.registry.get(data.get("payload", {}).get("device"))
+        except KeyError:
+            await self._reply({"type": "error", "id": data.get("id"), "error": "Неизвестный телевизор"})
+            return False
+        if not tv.circuit_open():
+            await tv.connect()
+        if not tv.connected:
+            await self._reply({"type": "error", "id": data.get("id"), "error": "Телевизор недоступен"})
+            return False
+        self.tv = tv
+        self._spawn(self._forward_state(tv.add_listener(all_updates=True)))
+        await self._reply({"type": "registered", "id": data.get("id"), "payload": {}})
+        return True
+
+    async def _subscribe(self, data):
+        uri = data["uri"]
+        self.subscriptions[uri] = data["id"]
+        payload = self.tv.state.get(uri)
+        if payload is not None:
+            await self._reply({"type": "response", "id": data["id"], "payload": payload})
+
+    async def _forward_state(self, queue):
+        try:
+            while True:
+                uri, payload = await queue.get()
+                if uri is None:
+                    # Телевизор отключился: состояние воркера тоже больше не актуально
+                    await self.socket.close()
+                    return
+                subscription_id = self.subscriptions.get(uri)
+                if subscription_id is not None:
+                    await self._reply({"type": "response", "id": subscription_id, "payload": payload})
+        finally:
+            self.tv.remove_listener(queue)
+
+    async def _step_volume(self, data):
+        try:
+            volume = await asyncio.wait_for(get_coalescer(self.tv).step(data["payload"]["delta"]), data.get("timeout"))
+        except TimeoutError:
+            raise TVTimeoutError("Телевизор не ответил вовремя") from None
+        return json.dumps({"type": "response", "payload": {"volume": volume}})
+
+    async def _request(self, data):
+        uri = data["uri"]
+        try:
+            if uri == VOLUME_STEP_URI:
+                response = await self._step_volume(data)
+            else:
+                response = await self.tv.send_command(
+                    command_label(uri), uri, data.get("payload", {}), read_only=is_read_only(uri),
+                    timeout=data.get("timeout"),
+                )
+            reply = json.loads(response)
+            reply["id"] = data["id"]
+        except TVBusyError as e:
+            reply = {"type": "broker_error", "id": data["id"], "error": "busy", "message": str(e),
+                     "retry_after": e.retry_after}
+        except TVTimeoutError as e:
+            reply = {"type": "broker_error", "id": data["id"], "error": "timeout", "message": str(e)}
+        except TVUnavailableError as e:
+            reply = {"type": "broker_error", "id": data["id"], "error": "unavailable", "message": str(e),
+                     "retry_after": e.retry_after}
+        except Exception as e:
+            reply = {"type": "broker_error", "id": data["id"], "error": "failed", "message": str(e)}
+        await self._reply(reply)
+
+    async def run(self):
+        try:
+            async for message in self.socket:
+                data = json.loads(message)
+                kind = data.get("type")
+                if kind == "register":
+                    if not await self._register(data):
+                        break
+                elif self.tv is None:
+                    break
+                elif kind == "subscribe":
+                    await self._subscribe(data)
+                elif kind == "request":
+                    self._spawn(self._request(data))
+        except Exception as e:
+            logging.error("Ошибка сессии воркера: %s", e)
+        finally:
+            for task in list(self.tasks):
+                task.cancel()
+            await self.socket.close()
+
+
+async def serve(registry, path):
+    """Брокер: единственный процесс, который держит соединения с телевизорами."""
+    for tv in registry.clients.values():
+        tv.start()
+
+    async def handle(reader, writer):
+        await WorkerSession(registry, BrokerSocket(reader, writer)).run()
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle, path)
+    # Сокет доступен только пользователю, от которого запущены брокер и воркеры
+    os.chmod(path, 0o600)
+    logging.info("🔀 Брокер телевизоров слушает %s", path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await asyncio.gather(*(tv.close() for tv in registry.clients.values()))
+        if capture.recorder is not None:
+            await capture.recorder.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Брокер соединений с телевизорами для нескольких воркеров")
+    parser.add_argument("--socket", default=TV_BROKER_SOCKET, required=TV_BROKER_SOCKET is None,
+                        help="путь Unix-сокета (по умолчанию TV_BROKER_SOCKET)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    logs.setup_logging()
+    # Брокер сам подключается к телевизорам, поэтому реестр строится без брокера
+    from devices import TVRegistry
+
+    asyncio.run(serve(TVRegistry.from_env(broker_socket=None), args.socket))
@@ -0,0 +1,59 @@
+import collections
+import gzip
+import hashlib
+import os
+import time
+
+# Сколько готовых ответов хранится всего
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE") or 256)
+# Уровень сжатия совпадает с GZipMiddleware приложения
+GZIP_LEVEL = 5
+
+
+class CachedResponse:
+    """Готовое тело ответа: JSON, его gzip и ETag считаются один раз при записи."""
+
+    def __init__(self, body, ttl):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.expires = time.monotonic() + ttl
+
+    def max_age(self):
+        return max(0, int(self.expires - time.monotonic()))
+
+
+class ResponseCache:
+    """TTL/LRU-кэш ответов на тяжёлые запросы чтения.
+
+    Ключ — (device, uri, payload); по истечении TTL запись удаляется при
+    обращении, при переполнении вытесняется давно не использованная.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, body, ttl):
+        entry = CachedResponse(body, ttl)
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, device, uris):
+        """Удаление записей телевизора device для перечисленных uri."""
+        uris = set(uris)
+        for key in [key for key in self.entries if key[0] == device and key[1] in uris]:
+            del self.entries[key]
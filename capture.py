@@ -0,0 +1,124 @@
+import asyncio
+import contextvars
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+import metrics
+from commands import CommandEnum
+
+load_dotenv()
+
+# Файл записи трафика (JSONL, только дозапись); не задан — запись выключена.
+# {pid} в пути подставляется, чтобы воркеры и брокер писали каждый в свой файл
+CAPTURE_FILE = os.getenv("CAPTURE_FILE")
+# Сколько записей может ждать сброса на диск; сверх этого новые отбрасываются
+CAPTURE_BUFFER_SIZE = int(os.getenv("CAPTURE_BUFFER_SIZE") or 10000)
+# Период сброса буфера на диск, секунды
+CAPTURE_FLUSH_INTERVAL = float(os.getenv("CAPTURE_FLUSH_INTERVAL") or 1)
+
+# Имя команды для записи: CommandEnum по uri, для команд каталога — путь ssap
+ENUM_BY_URI = {command.uri: command.name for command in CommandEnum}
+
+# HTTP-эндпоинт, в рамках которого выполняется команда
+current_endpoint = contextvars.ContextVar("current_endpoint", default=None)
+
+CAPTURE_DROPPED = metrics.Counter("capture_dropped_total", "Записи трафика, отброшенные при переполненном буфере")
+
+
+def encode(entry):
+    """Строка JSONL; payload и ответ телевизора уже JSON и вставляются как есть."""
+    meta, payload, response = entry
+    return f'{json.dumps(meta, ensure_ascii=False)[:-1]}, "payload": {payload}, "response": {response or "null"}}}\n'
+
+
+class CaptureWriter:
+    """Буферизованная запись трафика к телевизорам.
+
+    record() только кладёт запись в буфер и никогда не ждёт; сериализация и запись
+    на диск идут в отдельном потоке раз в flush_interval. При переполненном буфере
+    записи отбрасываются и считаются в метрике capture_dropped_total.
+    """
+
+    def __init__(self, path, buffer_size=CAPTURE_BUFFER_SIZE, flush_interval=CAPTURE_FLUSH_INTERVAL):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.flush_task = None
+        self.lock = asyncio.Lock()
+
+    def record(self, device, uri, payload, read_only, started, elapsed, response=None, error=None):
+        if len(self.buffer) >= self.buffer_size:
+            CAPTURE_DROPPED.inc()
+            return
+        meta = {
+            "ts": started,
+            "endpoint": current_endpoint.get(),
+            "device": device,
+            "command": ENUM_BY_URI.get(uri) or uri.removeprefix("ssap://"),
+            "uri": uri,
+            "read_only": read_only,
+            "elapsed": elapsed,
+            "error": error,
+        }
+        self.buffer.append((meta, payload, response))
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self.flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error("Не удалось записать трафик в %s: %s", self.path, e)
+
+    async def flush(self):
+        """Сброс накопленных записей на диск."""
+        # Один сброс за раз, чтобы записи в файле шли в порядке поступления
+        async with self.lock:
+            entries, self.buffer = self.buffer, []
+            if entries:
+                await asyncio.to_thread(self._write, entries)
+
+    def _write(self, entries):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.writelines(encode(entry) for entry in entries)
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+
+
+class CaptureMiddleware:
+    """ASGI-middleware: запоминает эндпоинт запроса для записей трафика."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        endpoint = f"{scope.get('method', 'WS')} {scope['path']}"
+        if scope.get("query_string"):
+            endpoint += "?" + scope["query_string"].decode()
+        token = current_endpoint.set(endpoint)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_endpoint.reset(token)
+
+
+recorder = CaptureWriter(CAPTURE_FILE.format(pid=os.getpid())) if CAPTURE_FILE else None
+
+
+def record(device, uri, payload, read_only, started, elapsed, response=None, error=None):
+    """Запись команды, если запись трафика включена."""
+    if recorder is not None:
+        recorder.record(device, uri, payload, read_only, started, elapsed, response, error)
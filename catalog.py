@@ -0,0 +1,108 @@
+import json
+
+from all_commands import commands
+from websocket import COMMAND_TIMEOUT
+
+# Префиксы uri, которые только читают состояние телевизора
+READ_PREFIXES = ("get", "list")
+EMPTY_PAYLOAD = "{}"
+
+# Тяжёлые и редко меняющиеся ответы, которые кэшируются: имя команды -> TTL, секунды
+CACHE_TTL = {
+    "tv/getChannelList": 600,
+    "com.webos.applicationManager/listApps": 300,
+    "com.webos.applicationManager/listLaunchPoints": 300,
+    "tv/getExternalInputList": 60,
+    "api/getServiceList": 3600,
+}
+
+# Команды с долгим ответом: имя команды -> сколько ждать ответа, секунды
+TIMEOUTS = {
+    "tv/getChannelList": 30,
+    "com.webos.applicationManager/listApps": 30,
+    "com.webos.applicationManager/listLaunchPoints": 30,
+}
+
+# Команды записи и закэшированные ответы, которые они делают неактуальными
+APP_LISTS = ("com.webos.applicationManager/listApps", "com.webos.applicationManager/listLaunchPoints")
+INVALIDATES = {
+    "system.launcher/launch": APP_LISTS,
+    "system.launcher/close": APP_LISTS,
+    "com.webos.applicationManager/launch": APP_LISTS,
+    "tv/switchInput": ("tv/getExternalInputList",),
+}
+
+
+class Command:
+    """Команда ssap из каталога all_commands.py со схемой payload.
+
+    Схема выводится из примера payload: тип каждого поля берётся из примера,
+    поля, встречающиеся во всех примерах для uri, обязательны.
+    """
+
+    def __init__(self, name, title, uri, schema, required):
+        self.name = name
+        self.title = title
+        self.uri = uri
+        self.schema = schema
+        self.required = required
+        self.read_only = uri.rsplit("/", 1)[-1].startswith(READ_PREFIXES)
+        self.cache_ttl = CACHE_TTL.get(name)
+        self.timeout = TIMEOUTS.get(name, COMMAND_TIMEOUT)
+        self.invalidates = tuple(f"ssap://{target}" for target in INVALIDATES.get(name, ()))
+
+    def build(self, payload=None):
+        """Проверка payload по схеме; возвращает (название, uri, payload в JSON).
+
+        ValueError, если payload не соответствует схеме.
+        """
+        if not payload:
+            if self.required:
+                raise ValueError(f"Не указаны обязательные поля: {', '.join(sorted(self.required))}")
+            return self.title, self.uri, EMPTY_PAYLOAD
+
+        unknown = payload.keys() - self.schema.keys()
+        if unknown:
+            raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+        missing = self.required - payload.keys()
+        if missing:
+            raise ValueError(f"Не указаны обязательные поля: {', '.join(sorted(missing))}")
+        for key, value in payload.items():
+            expected = self.schema[key]
+            # bool — подкласс int, но громкость True быть не может
+            if not isinstance(value, expected) or (expected is not bool and isinstance(value, bool)):
+                raise ValueError(f"Поле {key} должно быть типа {expected.__name__}")
+        return self.title, self.uri, json.dumps(payload)
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "title": self.title,
+            "uri": self.uri,
+            "read_only": self.read_only,
+            "cache_ttl": self.cache_ttl,
+            "timeout": self.timeout,
+            "payload": {key: value.__name__ for key, value in self.schema.items()},
+            "required": sorted(self.required),
+        }
+
+
+def build_catalog(entries):
+    """Каталог name -> Command; имя — путь uri без схемы ssap://."""
+    grouped = {}
+    for title, uri, example in entries:
+        grouped.setdefault(uri, []).append((title, example))
+
+    catalog = {}
+    for uri, examples in grouped.items():
+        schema = {}
+        for _, example in examples:
+            for key, value in example.items():
+                schema.setdefault(key, type(value))
+        required = set.intersection(*(set(example) for _, example in examples))
+        name = uri.removeprefix("ssap://")
+        catalog[name] = Command(name, examples[0][0], uri, schema, required)
+    return catalog
+
+
+CATALOG = build_catalog(commands)
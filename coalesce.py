@@ -0,0 +1,66 @@
+import asyncio
+import json
+import os
+
+from commands import CommandEnum
+
+# Окно, в течение которого шаги громкости копятся перед отправкой
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW") or 0.05)
+MAX_VOLUME = 100
+
+
+class VolumeCoalescer:
+    """Склейка частых volumeUp/volumeDown в одну команду setVolume.
+
+    Шаги, пришедшие в пределах окна, суммируются; целевая громкость считается от
+    известного состояния, и все ожидающие получают итоговое значение.
+    """
+
+    def __init__(self, tv, max_age, window=COALESCE_WINDOW):
+        self.tv = tv
+        self.max_age = max_age
+        self.window = window
+        self.delta = 0
+        self.waiters = []
+        self.flush_task = None
+        # Окна применяются строго по очереди, чтобы каждое считало от результата предыдущего
+        self.lock = asyncio.Lock()
+
+    async def step(self, delta):
+        """Добавить шаг громкости и дождаться итоговой громкости."""
+        future = asyncio.get_running_loop().create_future()
+        self.delta += delta
+        self.waiters.append(future)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self):
+        await asyncio.sleep(self.window)
+        async with self.lock:
+            delta, waiters = self.delta, self.waiters
+            self.delta, self.waiters, self.flush_task = 0, [], None
+            try:
+                volume = await self._apply(delta)
+            except Exception as e:
+                for future in waiters:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in waiters:
+                    if not future.done():
+                        future.set_result(volume)
+
+    async def _apply(self, delta):
+        status_uri = CommandEnum.VOLUME_STATUS.uri
+        status = self.tv.get_state(status_uri, self.max_age)
+        if status is None:
+            response = await self.tv.send_command(*CommandEnum.VOLUME_STATUS.with_payload(), read_only=True)
+            status = json.loads(response)["payload"]
+
+        current = status.get("volume", 0)
+        target = max(0, min(MAX_VOLUME, current + delta))
+        if target != current:
+            await self.tv.send_command(*CommandEnum.VOLUME_SET.with_payload(volume=target))
+            self.tv.update_state(status_uri, {"volume": target})
+        return target
@@ -2,9 +2,9 @@ from enum import Enum
 
 
 class CommandEnum(Enum):
-    POWER_STATE = ("Состояние питания", "ssap://com.webos.service.tvpower/power/getPowerState", {})
+    POWER_STATE = ("Состояние питания", "ssap://com.webos.service.tvpower/power/getPowerState", {}, True)
     POWER_OFF = ("Выключить телевизор", "ssap://system/turnOff", {})
-    VOLUME_STATUS = ("Получить статус звука", "ssap://audio/getStatus", {})
+    VOLUME_STATUS = ("Получить статус звука", "ssap://audio/getStatus", {}, True)
     VOLUME_SET = ("Установить громкость", "ssap://audio/setVolume", {"volume": None})
     VOLUME_UP = ("Увеличить громкость", "ssap://audio/volumeUp", {})
     VOLUME_DOWN = ("Уменьшить громкость", "ssap://audio/volumeDown", {})
@@ -15,11 +15,14 @@ class CommandEnum(Enum):
     BACK = ("Перемотка назад", "ssap://media.controls/rewind", {})
     SECOND = ("Перемотка вперёд", "ssap://media.controls/fastForward", {})
     SET_CHANNEL = ("Установить канал", "ssap://tv/openChannel", {"channelId": None})
+    FOREGROUND_APP = ("Информация о текущем приложении", "ssap://com.webos.applicationManager/getForegroundAppInfo", {}, True)
 
-    def __init__(self, name, uri, payload_template):
+    def __init__(self, name, uri, payload_template, read_only=False):
         self.command_name = name
         self.uri = uri
         self.payload_template = payload_template
+        # Команда только читает состояние: одинаковые запросы можно объединять
+        self.read_only = read_only
 
     def with_payload(self, **kwargs):
         payload = self.payload_template.copy()
@@ -27,3 +30,15 @@ class CommandEnum(Enum):
             if k in payload or payload == {}:
                 payload[k] = v
         return self.command_name, self.uri, payload
+
+
+# Макросы плеера: имя -> последовательность шагов (команда, payload)
+MACROS = {
+    "auto": ((CommandEnum.PLAY, {}),),
+    "eco": ((CommandEnum.PAUSE, {}),),
+    "quiet": ((CommandEnum.STOP, {}),),
+    "express": ((CommandEnum.SECOND, {}),),
+    "glass": ((CommandEnum.BACK, {}),),
+    "intensive": ((CommandEnum.BACK, {}),) * 3,
+    "pre_rinse": ((CommandEnum.SECOND, {}),) * 3,
+}
@@ -0,0 +1,54 @@
+import contextvars
+import os
+import time
+
+from dotenv import load_dotenv
+
+from websocket import COMMAND_TIMEOUT
+
+load_dotenv()
+
+# Общий срок HTTP-запроса к телевизору, секунды; клиент может сократить его заголовком
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT") or 15)
+TIMEOUT_HEADER = b"x-request-timeout"
+
+# Момент (time.monotonic), к которому должен быть готов ответ на текущий HTTP-запрос
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+def timeout(limit=COMMAND_TIMEOUT):
+    """Сколько можно ждать очередного шага: не дольше limit и оставшегося срока запроса."""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return limit
+    return min(limit, deadline - time.monotonic())
+
+
+class DeadlineMiddleware:
+    """ASGI-middleware: срок обработки HTTP-запроса из REQUEST_TIMEOUT или X-Request-Timeout.
+
+    WebSocket-соединения живут долго и срока не получают: их команды ограничены
+    только таймаутом команды.
+    """
+
+    def __init__(self, app, request_timeout=REQUEST_TIMEOUT):
+        self.app = app
+        self.request_timeout = request_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.request_timeout
+        for name, value in scope["headers"]:
+            if name == TIMEOUT_HEADER:
+                try:
+                    limit = min(limit, float(value))
+                except ValueError:
+                    pass
+        token = current_deadline.set(time.monotonic() + limit)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_deadline.reset(token)
@@ -0,0 +1,81 @@
+import json
+import os
+
+from dotenv import load_dotenv
+
+from broker import TV_BROKER_SOCKET, BrokeredClient
+from websocket import CLIENT_KEY_FILE, PORT, TV_IP, LGWebOSClient
+
+load_dotenv()
+
+# JSON-файл с описанием телевизоров:
+# {"devices": {"hall": {"ip": "192.168.1.10", "port": 3000}}, "groups": {"wall": ["hall"]}}
+TV_DEVICES_FILE = os.getenv("TV_DEVICES_FILE")
+# Либо короткая запись в env: "hall=192.168.1.10,kitchen=192.168.1.11:3000"
+TV_DEVICES = os.getenv("TV_DEVICES")
+TV_DEFAULT_DEVICE = os.getenv("TV_DEFAULT_DEVICE")
+
+# Группа, в которую всегда входят все телевизоры
+ALL_GROUP = "all"
+
+
+class TVRegistry:
+    """Реестр телевизоров: по одному LGWebOSClient со своим ключом на устройство.
+
+    С broker_socket клиенты ходят к телевизорам через брокер (broker.py), который
+    держит единственное соединение с каждым телевизором на все воркеры.
+    """
+
+    def __init__(self, devices, groups=None, default=None, broker_socket=None):
+        if not devices:
+            raise ValueError("Не задано ни одного телевизора")
+        self.clients = {}
+        for device_id, config in devices.items():
+            options = dict(
+                ip=config["ip"],
+                port=config.get("port", PORT),
+                client_key_file=config.get("client_key_file") or f"client_key_{device_id}.json",
+                name=device_id,
+            )
+            if broker_socket:
+                self.clients[device_id] = BrokeredClient(broker_socket, **options)
+            else:
+                self.clients[device_id] = LGWebOSClient(**options)
+        self.groups = {name: list(members) for name, members in (groups or {}).items()}
+        self.groups[ALL_GROUP] = list(self.clients)
+        self.default = default or next(iter(self.clients))
+
+    @classmethod
+    def from_env(cls, broker_socket=TV_BROKER_SOCKET):
+        """Реестр из TV_DEVICES_FILE или TV_DEVICES; без них — один телевизор TV_IP."""
+        if TV_DEVICES_FILE:
+            with open(TV_DEVICES_FILE, "r") as f:
+                config = json.load(f)
+            return cls(config["devices"], config.get("groups"), TV_DEFAULT_DEVICE or config.get("default"),
+                       broker_socket=broker_socket)
+
+        if TV_DEVICES:
+            devices = {}
+            for item in TV_DEVICES.split(","):
+                device_id, _, address = item.strip().partition("=")
+                host, _, port = address.partition(":")
+                devices[device_id] = {"ip": host, "port": int(port) if port else PORT}
+            return cls(devices, default=TV_DEFAULT_DEVICE, broker_socket=broker_socket)
+
+        # Прежний режим с одним телевизором и прежним файлом ключа
+        return cls({"default": {"ip": TV_IP, "port": PORT, "client_key_file": CLIENT_KEY_FILE}},
+                   broker_socket=broker_socket)
+
+    def get(self, device_id=None):
+        """Клиент телевизора; KeyError для неизвестного device_id."""
+        return self.clients[device_id or self.default]
+
+    def group(self, group_id):
+        """Клиенты группы: device_id -> LGWebOSClient; KeyError для неизвестной группы."""
+        if group_id in self.groups:
+            return {device_id: self.clients[device_id] for device_id in self.groups[group_id]}
+        # Отдельный телевизор можно использовать как группу из одного устройства
+        return {group_id: self.clients[group_id]}
+
+
+registry = TVRegistry.from_env()
@@ -0,0 +1,145 @@
+import atexit
+import contextvars
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import uuid
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_LEVEL = (os.getenv("LOG_LEVEL") or "INFO").upper()
+# Формат вывода: text — строка для человека, json — одна JSON-запись на строку
+LOG_FORMAT = os.getenv("LOG_FORMAT") or "text"
+# Сторонние библиотеки (кадры websockets) не пишут подробнее этого уровня
+LIBRARY_LOG_LEVEL = logging.INFO
+# Лог сообщений телевизора (DEBUG) частый: в вывод попадает каждое N-е
+LOG_MESSAGE_SAMPLE = int(os.getenv("LOG_MESSAGE_SAMPLE") or 100)
+
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+REQUEST_ID_HEADER = b"x-request-id"
+
+# Логгер отдельных сообщений ssap, с выборкой
+MESSAGE_LOG = logging.getLogger("tv.messages")
+
+# Идентификаторы для связи записей лога: HTTP-запрос и команда к телевизору
+request_id = contextvars.ContextVar("request_id", default=None)
+command_id = contextvars.ContextVar("command_id", default=None)
+
+# Стандартные поля LogRecord; всё остальное из extra попадает в JSON как есть
+RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет в запись идентификаторы запроса и команды из контекста, где она создана."""
+
+    def filter(self, record):
+        record.request_id = request_id.get()
+        record.command_id = command_id.get()
+        return True
+
+
+class SampleFilter(logging.Filter):
+    """Пропускает каждую every-ю запись."""
+
+    def __init__(self, every):
+        super().__init__()
+        self.counter = itertools.count()
+        self.every = max(1, every)
+
+    def filter(self, record):
+        return next(self.counter) % self.every == 0
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь без форматирования: оно и вывод идут в потоке QueueListener.
+
+    Аргументы записей должны быть неизменяемыми (строки, числа), иначе к моменту
+    форматирования они могут измениться.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    """Одна JSON-запись на строку: время, уровень, логгер, сообщение, идентификаторы и extra."""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_FIELDS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Прежний текстовый формат; идентификаторы запроса и команды — в конце строки, если есть."""
+
+    def formatMessage(self, record):
+        line = super().formatMessage(record)
+        ids = [
+            f"{key}={getattr(record, field)}"
+            for key, field in (("request", "request_id"), ("command", "command_id"))
+            if getattr(record, field, None) is not None
+        ]
+        return f"{line} [{' '.join(ids)}]" if ids else line
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Корневой логгер пишет через очередь; вывод в stderr — в отдельном потоке."""
+    root = logging.getLogger()
+    if any(isinstance(handler, LazyQueueHandler) for handler in root.handlers):
+        return
+
+    stream = logging.StreamHandler()
+    stream.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    handler = LazyQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    listener.start()
+    # Остаток очереди дописывается при завершении процесса
+    atexit.register(listener.stop)
+
+    root.handlers = [handler]
+    root.setLevel(level)
+    logging.getLogger("websockets").setLevel(max(logging.getLevelName(level), LIBRARY_LOG_LEVEL))
+    MESSAGE_LOG.addFilter(SampleFilter(LOG_MESSAGE_SAMPLE))
+
+
+class RequestIdMiddleware:
+    """ASGI-middleware: идентификатор запроса из X-Request-ID или новый; возвращается в ответе."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        value = dict(scope["headers"]).get(REQUEST_ID_HEADER)
+        current = value.decode("latin-1")[:64] if value else uuid.uuid4().hex[:16]
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (REQUEST_ID_HEADER, current.encode("latin-1"))]
+            await send(message)
+
+        token = request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
@@ -1,148 +1,547 @@
+import asyncio
+import contextlib
 import json
-import logging
+import os
+import time
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
-
-from commands import CommandEnum
-from websocket import tv_client
+from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+import capture
+import deadline
+import logs
+import metrics
+from cache import CachedResponse, ResponseCache
+from catalog import CATALOG
+from broker import BrokeredClient, BrokeredVolumeCoalescer
+from coalesce import VolumeCoalescer
+from commands import MACROS, CommandEnum
+from devices import registry
+from pointer import BUTTONS
+from scheduler import TVBusyError
+from websocket import LGWebOSClient, TVUnavailableError
 
 from fastapi.middleware.gzip import GZipMiddleware
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
+logs.setup_logging()
+
+# Сколько секунд кэш состояния из подписки считается свежим
+STATE_MAX_AGE = float(os.getenv("STATE_MAX_AGE") or 30)
+# Сколько ждать push-обновления состояния после команды
+STATE_WAIT_TIMEOUT = float(os.getenv("STATE_WAIT_TIMEOUT") or 0.5)
+# Период комментария-keepalive в потоке SSE
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE") or 15)
+
+# Сколько ждать подключения к телевизорам при старте приложения
+STARTUP_CONNECT_TIMEOUT = float(os.getenv("STARTUP_CONNECT_TIMEOUT") or 10)
+# Готовность: "all" — подключены все телевизоры, "any" — хотя бы один
+READY_DEVICES = os.getenv("READY_DEVICES") or "all"
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Рукопожатие и регистрация до первого запроса, а не на нём
+    await asyncio.gather(*(tv.connect(STARTUP_CONNECT_TIMEOUT) for tv in registry.clients.values()))
+    yield
+    await asyncio.gather(*(tv.close() for tv in registry.clients.values()))
+    if capture.recorder is not None:
+        await capture.recorder.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(GZipMiddleware, minimum_size=1000, compresslevel=5)
+app.add_middleware(deadline.DeadlineMiddleware)
+app.add_middleware(logs.RequestIdMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, prefixes={"device_id": "/tv/{device_id}"})
+if capture.recorder is not None:
+    app.add_middleware(capture.CaptureMiddleware)
+
+# Одни и те же маршруты для телевизора по умолчанию и для /tv/{device_id}
+router = APIRouter()
+
+
+def get_tv(device_id: str = None) -> LGWebOSClient:
+    try:
+        return registry.get(device_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Неизвестный телевизор: {device_id}")
+
 
+def tv_error(error: Exception) -> HTTPException:
+    """HTTP-ошибка для сбоя команды: 504 без ответа в срок, 429 при переполненной очереди, иначе 503;
+    с Retry-After, если он известен."""
+    if isinstance(error, TimeoutError):
+        return HTTPException(status_code=504, detail=str(error) or "Телевизор не ответил вовремя")
+    if isinstance(error, TVBusyError):
+        return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+    headers = None
+    if isinstance(error, TVUnavailableError):
+        headers = {"Retry-After": str(error.retry_after)}
+    return HTTPException(status_code=503, detail=str(error), headers=headers)
 
-async def execute_command(command_enum: CommandEnum, **payload_kwargs):
+
+# Готовые ответы на тяжёлые запросы чтения из каталога
+response_cache = ResponseCache()
+
+# Склейка шагов громкости: по одному на телевизор
+coalescers = {}
+
+
+def get_coalescer(tv: LGWebOSClient) -> VolumeCoalescer:
+    if tv not in coalescers:
+        # Через брокер громкость считается в нём: воркеры отправляют только шаги
+        coalescer_class = BrokeredVolumeCoalescer if isinstance(tv, BrokeredClient) else VolumeCoalescer
+        coalescers[tv] = coalescer_class(tv, STATE_MAX_AGE)
+    return coalescers[tv]
+
+
+async def execute_command(tv: LGWebOSClient, command_enum: CommandEnum, **payload_kwargs):
     try:
         command_name, uri, payload = command_enum.with_payload(**payload_kwargs)
-        response_raw = await tv_client.send_command(command_name, uri, payload)
+        response_raw = await tv.send_command(
+            command_name, uri, payload, read_only=command_enum.read_only, timeout=deadline.timeout()
+        )
         return json.loads(response_raw)
     except Exception as e:
-        raise HTTPException(status_code=503, detail=str(e))
+        raise tv_error(e)
 
 
-@app.get("/power")
-async def get_power():
-    result = await execute_command(CommandEnum.POWER_STATE)
-    return JSONResponse(content={"value": result["payload"].get("returnValue", False)})
+async def read_state(tv: LGWebOSClient, command_enum: CommandEnum):
+    """Payload состояния из кэша подписки, при его отсутствии — запросом к телевизору."""
+    payload = tv.get_state(command_enum.uri, STATE_MAX_AGE)
+    if payload is None:
+        result = await execute_command(tv, command_enum)
+        payload = result["payload"]
+    return payload
 
 
-@app.get("/power/off")
-async def power_off():
-    await execute_command(CommandEnum.POWER_OFF)
+async def change_and_read(tv: LGWebOSClient, command_enum: CommandEnum, state_enum: CommandEnum, **payload_kwargs):
+    """Выполнение команды и получение нового состояния из push-обновления подписки."""
+    update = None
+    if tv.get_state(state_enum.uri, STATE_MAX_AGE) is not None:
+        update = tv.watch_state(state_enum.uri)
+    try:
+        await execute_command(tv, command_enum, **payload_kwargs)
+        if update is not None:
+            try:
+                return await asyncio.wait_for(update, deadline.timeout(STATE_WAIT_TIMEOUT))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if update is not None:
+            update.cancel()
+    result = await execute_command(tv, state_enum)
+    return result["payload"]
+
+
+async def run_steps(tv: LGWebOSClient, steps, ordered=True):
+    """Конвейерное выполнение шагов (команда, payload) с результатом по каждому шагу.
+
+    ordered=True отправляет кадры подряд в заданном порядке и собирает ответы после,
+    ordered=False выполняет команды независимо друг от друга.
+    """
+    commands = [command_enum.with_payload(**payload) for command_enum, payload in steps]
+    try:
+        if ordered:
+            responses = await tv.send_pipelined(commands, timeout=deadline.timeout())
+        else:
+            responses = await asyncio.gather(
+                *(
+                    tv.send_command(*command, read_only=command_enum.read_only, timeout=deadline.timeout())
+                    for (command_enum, _), command in zip(steps, commands)
+                ),
+                return_exceptions=True,
+            )
+    except Exception as e:
+        raise tv_error(e)
+
+    results = []
+    for (command_enum, _), response in zip(steps, responses):
+        if isinstance(response, Exception):
+            results.append({
+                "command": command_enum.name,
+                "ok": False,
+                "error": str(response),
+                "status": tv_error(response).status_code,
+            })
+        else:
+            data = json.loads(response)
+            results.append({
+                "command": command_enum.name,
+                "ok": data.get("type") != "error",
+                "payload": data.get("payload"),
+            })
+    return results
+
+
+@router.get("/power")
+async def get_power(tv: LGWebOSClient = Depends(get_tv)):
+    payload = await read_state(tv, CommandEnum.POWER_STATE)
+    return JSONResponse(content={"value": payload.get("returnValue", False)})
+
+
+@router.get("/power/off")
+async def power_off(tv: LGWebOSClient = Depends(get_tv)):
+    await execute_command(tv, CommandEnum.POWER_OFF)
     return JSONResponse(content={"power": False})
 
 
-@app.get("/volume")
-async def get_volume():
-    result = await execute_command(CommandEnum.VOLUME_STATUS)
-    return JSONResponse(content={"value": result["payload"].get("volume", 0)})
+@router.get("/volume")
+async def get_volume(tv: LGWebOSClient = Depends(get_tv)):
+    payload = await read_state(tv, CommandEnum.VOLUME_STATUS)
+    return JSONResponse(content={"value": payload.get("volume", 0)})
 
 
-@app.get("/volume/up")
-async def volume_up():
-    await execute_command(CommandEnum.VOLUME_UP)
-    result = await execute_command(CommandEnum.VOLUME_STATUS)
-    return JSONResponse(content={"value": result["payload"].get("volume", 0)})
+@router.get("/volume/up")
+async def volume_up(tv: LGWebOSClient = Depends(get_tv)):
+    try:
+        volume = await asyncio.wait_for(get_coalescer(tv).step(1), deadline.timeout())
+    except Exception as e:
+        raise tv_error(e)
+    return JSONResponse(content={"value": volume})
 
 
-@app.get("/volume/down")
-async def volume_down():
-    await execute_command(CommandEnum.VOLUME_DOWN)
-    result = await execute_command(CommandEnum.VOLUME_STATUS)
-    return JSONResponse(content={"value": result["payload"].get("volume", 0)})
+@router.get("/volume/down")
+async def volume_down(tv: LGWebOSClient = Depends(get_tv)):
+    try:
+        volume = await asyncio.wait_for(get_coalescer(tv).step(-1), deadline.timeout())
+    except Exception as e:
+        raise tv_error(e)
+    return JSONResponse(content={"value": volume})
 
 
-@app.get("/volume/set/{value}")
-async def set_volume(value: int):
-    await execute_command(CommandEnum.VOLUME_SET, volume=value)
+@router.get("/volume/set/{value}")
+async def set_volume(value: int, tv: LGWebOSClient = Depends(get_tv)):
+    await execute_command(tv, CommandEnum.VOLUME_SET, volume=value)
     return JSONResponse(content={"volume": value})
 
 
-@app.get("/mute")
-async def get_power():
-    result = await execute_command(CommandEnum.VOLUME_STATUS)
-    return JSONResponse(content={"value": result["payload"].get("mute", False)})
+@router.get("/mute")
+async def get_power(tv: LGWebOSClient = Depends(get_tv)):
+    payload = await read_state(tv, CommandEnum.VOLUME_STATUS)
+    return JSONResponse(content={"value": payload.get("mute", False)})
 
 
-@app.get("/mute/toggle")
-async def mute_toggle():
-    current = await execute_command(CommandEnum.VOLUME_STATUS)
-    is_muted = current["payload"].get("mute", False)
-    await execute_command(CommandEnum.MUTE_TOGGLE, mute=not is_muted)
-    return JSONResponse(content={"value": not is_muted})
+@router.get("/mute/toggle")
+async def mute_toggle(tv: LGWebOSClient = Depends(get_tv)):
+    current = await read_state(tv, CommandEnum.VOLUME_STATUS)
+    is_muted = current.get("mute", False)
+    payload = await change_and_read(tv, CommandEnum.MUTE_TOGGLE, CommandEnum.VOLUME_STATUS, mute=not is_muted)
+    return JSONResponse(content={"value": payload.get("mute", not is_muted)})
 
 
-async def play():
-    await execute_command(CommandEnum.PLAY)
+@router.get("/player/{value}")
+async def second(value: str, tv: LGWebOSClient = Depends(get_tv)):
+    steps = MACROS.get(value)
+    if steps:
+        results = await run_steps(tv, steps, ordered=True)
+        # Ошибка только при сбое связи (503/504/429), а не при ответе телевизора с ошибкой
+        failed = [step for step in results if "error" in step]
+        if failed:
+            raise HTTPException(status_code=failed[0]["status"], detail=failed[0]["error"])
     return JSONResponse(content={"value": True})
 
 
-async def pause():
-    await execute_command(CommandEnum.PAUSE)
-    return JSONResponse(content={"value": True})
+class BatchStep(BaseModel):
+    command: str
+    payload: dict = {}
 
 
-async def stop():
-    await execute_command(CommandEnum.STOP)
-    return JSONResponse(content={"value": True})
+class BatchRequest(BaseModel):
+    steps: list[BatchStep]
+    # True — кадры уходят строго по порядку; False — команды выполняются независимо
+    ordered: bool = True
 
 
-async def back():
-    await execute_command(CommandEnum.BACK)
-    return JSONResponse(content={"value": True})
+@router.post("/batch")
+async def batch(request: BatchRequest, tv: LGWebOSClient = Depends(get_tv)):
+    try:
+        steps = [(CommandEnum[step.command], step.payload) for step in request.steps]
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=f"Неизвестная команда: {e.args[0]}")
+    results = await run_steps(tv, steps, ordered=request.ordered)
+    return JSONResponse(content={"results": results})
+
+
+@router.post("/command/{name:path}")
+async def run_command(
+    name: str,
+    request: Request,
+    payload: dict | None = Body(default=None),
+    tv: LGWebOSClient = Depends(get_tv),
+):
+    """Любая команда из каталога all_commands.py по пути uri, например /command/audio/setVolume."""
+    command = CATALOG.get(name)
+    if command is None:
+        raise HTTPException(status_code=404, detail=f"Неизвестная команда: {name}")
+    try:
+        title, uri, payload_json = command.build(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
+    cache_key = (tv.name, uri, payload_json)
+    if command.cache_ttl:
+        entry = response_cache.get(cache_key)
+        if entry is not None:
+            return cached_response(request, entry)
 
-async def back_to_minute():
-    await execute_command(CommandEnum.BACK)
-    await execute_command(CommandEnum.BACK)
-    await execute_command(CommandEnum.BACK)
+    try:
+        response = await tv.send_command(
+            title, uri, payload_json, read_only=command.read_only, timeout=deadline.timeout(command.timeout)
+        )
+    except Exception as e:
+        raise tv_error(e)
+    data = json.loads(response)
+    ok = data.get("type") != "error"
+    content = {"command": name, "ok": ok, "payload": data.get("payload")}
+
+    if ok and command.invalidates:
+        response_cache.invalidate(tv.name, command.invalidates)
+    if ok and command.cache_ttl:
+        entry = response_cache.put(cache_key, json.dumps(content).encode(), command.cache_ttl)
+        return cached_response(request, entry)
+    return JSONResponse(content=content)
+
+
+def cached_response(request: Request, entry: CachedResponse) -> Response:
+    """Ответ из кэша: 304 по If-None-Match, иначе готовое тело, сжатое заранее, если клиент принимает gzip."""
+    headers = {"ETag": entry.etag, "Cache-Control": f"private, max-age={entry.max_age()}", "Vary": "Accept-Encoding"}
+    if entry.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzip_body, media_type="application/json", headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+@app.get("/commands")
+async def list_commands():
+    return JSONResponse(content={"commands": [command.describe() for command in CATALOG.values()]})
+
+
+def state_event(tv: LGWebOSClient, uri: str, payload: dict):
+    """Событие для UI из payload подписки: громкость/звук, питание или текущее приложение."""
+    if uri == CommandEnum.VOLUME_STATUS.uri:
+        return {"device": tv.name, "volume": payload.get("volume", 0), "mute": payload.get("mute", False)}
+    if uri == CommandEnum.POWER_STATE.uri:
+        return {"device": tv.name, "power": payload.get("returnValue", False)}
+    if uri == CommandEnum.FOREGROUND_APP.uri:
+        return {"device": tv.name, "app": payload.get("appId")}
+    return None
+
+
+async def state_events(tv: LGWebOSClient):
+    """Текущее состояние, затем его изменения; None — время отправить keepalive.
+
+    Все клиенты читают одну подписку на телевизоре, у каждого своя очередь.
+    """
+    queue = tv.add_listener()
+    try:
+        # Подписки оформляются при подключении; ждать его здесь не нужно
+        tv.start()
+        for uri, payload in list(tv.state.items()):
+            event = state_event(tv, uri, payload)
+            if event is not None:
+                yield event
+        while True:
+            try:
+                uri, payload = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            event = state_event(tv, uri, payload)
+            if event is not None:
+                yield event
+    finally:
+        tv.remove_listener(queue)
+
+
+@router.get("/events")
+async def events(tv: LGWebOSClient = Depends(get_tv)):
+    async def stream():
+        async for event in state_events(tv):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: state\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def state_socket(websocket: WebSocket, tv: LGWebOSClient = Depends(get_tv)):
+    await websocket.accept()
+    events = state_events(tv)
+    # Входящие сообщения не нужны, но без чтения не узнать об отключении клиента
+    incoming = asyncio.create_task(websocket.receive())
+    next_event = None
+    try:
+        while True:
+            if next_event is None:
+                next_event = asyncio.ensure_future(anext(events))
+            done, _ = await asyncio.wait({next_event, incoming}, return_when=asyncio.FIRST_COMPLETED)
+            if incoming in done:
+                if incoming.result()["type"] == "websocket.disconnect":
+                    break
+                incoming = asyncio.create_task(websocket.receive())
+            if next_event in done:
+                event, next_event = next_event.result(), None
+                if event is not None:
+                    await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        incoming.cancel()
+        if next_event is not None:
+            next_event.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await next_event
+        await events.aclose()
+
+
+@router.get("/input/button/{name}")
+async def input_button(name: str, tv: LGWebOSClient = Depends(get_tv)):
+    name = name.upper()
+    if name not in BUTTONS:
+        raise HTTPException(status_code=422, detail=f"Неизвестная кнопка: {name}")
+    try:
+        await tv.pointer.button(name)
+    except Exception as e:
+        raise tv_error(e)
     return JSONResponse(content={"value": True})
 
 
-async def second_time():
-    await execute_command(CommandEnum.SECOND)
+@router.get("/input/click")
+async def input_click(tv: LGWebOSClient = Depends(get_tv)):
+    try:
+        await tv.pointer.click()
+    except Exception as e:
+        raise tv_error(e)
     return JSONResponse(content={"value": True})
 
 
-async def second_to_minute():
-    await execute_command(CommandEnum.SECOND)
-    await execute_command(CommandEnum.SECOND)
-    await execute_command(CommandEnum.SECOND)
+@router.get("/input/move")
+async def input_move(dx: int = 0, dy: int = 0, drag: bool = False, tv: LGWebOSClient = Depends(get_tv)):
+    # Перемещение уходит в ближайшем окне склейки, ответ не ждёт отправки
+    tv.pointer.move(dx, dy, drag)
     return JSONResponse(content={"value": True})
 
 
-@app.get("/player/{value}")
-async def second(value: str):
-    match value:
-        case "auto":
-            await play()
-        case "eco":
-            await pause()
-        case "quiet":
-            await stop()
-        case "express":
-            await second_time()
-        case "glass":
-            await back()
-        case "intensive":
-            await back_to_minute()
-        case "pre_rinse":
-            await second_to_minute()
-        case _:
-            pass
+@router.get("/input/scroll")
+async def input_scroll(dx: int = 0, dy: int = 0, tv: LGWebOSClient = Depends(get_tv)):
+    try:
+        await tv.pointer.scroll(dx, dy)
+    except Exception as e:
+        raise tv_error(e)
     return JSONResponse(content={"value": True})
 
 
+@router.websocket("/input/ws")
+async def input_socket(websocket: WebSocket, tv: LGWebOSClient = Depends(get_tv)):
+    """Поток ввода: {"type": "move", "dx": 5, "dy": -3}, {"type": "button", "name": "ENTER"},
+    {"type": "click"}, {"type": "scroll", "dx": 0, "dy": 1}. Ошибки возвращаются сообщением {"error": ...}.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                frame = await websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(frame.get("code", 1000))
+                message = json.loads(frame.get("text") or frame.get("bytes") or "")
+                if not isinstance(message, dict):
+                    raise ValueError("Сообщение должно быть JSON-объектом")
+                kind = message.get("type")
+                if kind == "move":
+                    tv.pointer.move(int(message.get("dx", 0)), int(message.get("dy", 0)), bool(message.get("drag")))
+                elif kind == "button" and str(message.get("name", "")).upper() in BUTTONS:
+                    await tv.pointer.button(message["name"].upper())
+                elif kind == "click":
+                    await tv.pointer.click()
+                elif kind == "scroll":
+                    await tv.pointer.scroll(int(message.get("dx", 0)), int(message.get("dy", 0)))
+                else:
+                    await websocket.send_json({"error": f"Неизвестное сообщение: {message}"})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                await websocket.send_json({"error": str(e) or type(e).__name__})
+    except WebSocketDisconnect:
+        pass
+
+
+class FanoutRequest(BaseModel):
+    command: str
+    payload: dict = {}
+
+
+@app.post("/group/{group_id}/command")
+async def group_command(group_id: str, request: FanoutRequest):
+    """Одна команда на группу телевизоров параллельно с результатом по каждому."""
+    try:
+        command_enum = CommandEnum[request.command]
+    except KeyError:
+        raise HTTPException(status_code=422, detail=f"Неизвестная команда: {request.command}")
+    try:
+        clients = registry.group(group_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Неизвестная группа: {group_id}")
+
+    async def run_on(tv):
+        try:
+            return (await run_steps(tv, [(command_enum, request.payload)]))[0]
+        except HTTPException as e:
+            return {"command": command_enum.name, "ok": False, "error": e.detail}
+
+    results = await asyncio.gather(*(run_on(tv) for tv in clients.values()))
+    return JSONResponse(content={"results": dict(zip(clients, results))})
+
+
+@app.get("/tv")
+async def list_tvs():
+    return JSONResponse(content={
+        "default": registry.default,
+        "devices": {
+            device_id: {"ip": tv.ip, "port": tv.port, "connected": tv.connected}
+            for device_id, tv in registry.clients.items()
+        },
+        "groups": registry.groups,
+    })
+
+
+@app.get("/healthz")
+async def healthz():
+    return JSONResponse(content={"status": "ok"})
+
+
+@app.get("/readyz")
+async def readyz():
+    devices = {device_id: tv.connected for device_id, tv in registry.clients.items()}
+    check = any if READY_DEVICES == "any" else all
+    ready = check(devices.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "devices": devices})
+
+
+@app.get("/metrics")
+async def get_metrics():
+    # Состояние соединений считается в момент опроса, а не на каждом запросе
+    now = time.monotonic()
+    for tv in registry.clients.values():
+        metrics.TV_CONNECTED.set(int(tv.connected), tv.name)
+        metrics.TV_COMMANDS_QUEUED.set(tv.scheduler.waiting(), tv.name)
+        metrics.TV_UPTIME.set(round(now - tv.connected_since, 3) if tv.connected else 0, tv.name)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+app.include_router(router)
+app.include_router(router, prefix="/tv/{device_id}")
+
+
 if __name__ == "__main__":
     # Запуск FastAPI приложения через uvicorn в асинхронном режиме
     uvicorn.run("main:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,153 @@
+import bisect
+import time
+
+# Границы корзин гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Все метрики в порядке объявления; выводятся эндпоинтом /metrics
+REGISTRY = []
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values, extra=""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Монотонный счётчик Prometheus. Значения меток передаются позиционно."""
+
+    kind = "counter"
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, value=1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labels, labels)} {value}"
+
+
+class Gauge(Counter):
+    """Значение, которое может как расти, так и уменьшаться."""
+
+    kind = "gauge"
+
+    def dec(self, *labels, value=1):
+        self.values[labels] = self.values.get(labels, 0) - value
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами; observe — один bisect и два сложения."""
+
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = buckets
+        # Метки -> [счётчики по корзинам + корзина +Inf, сумма]
+        self.values = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                bucket_labels = format_labels(self.labels, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}"
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+TV_COMMAND_SECONDS = Histogram(
+    "tv_command_duration_seconds", "Время от отправки команды до ответа телевизора", ("device", "command")
+)
+TV_COMMANDS_IN_FLIGHT = Gauge("tv_commands_in_flight", "Команды, ожидающие ответа телевизора", ("device",))
+TV_COMMANDS_QUEUED = Gauge("tv_commands_queued", "Команды, ждущие очереди в планировщике", ("device",))
+TV_COMMAND_FAILURES = Counter(
+    "tv_command_failures_total", "Команды, завершившиеся ошибкой связи", ("device", "command")
+)
+TV_COMMAND_TIMEOUTS = Counter(
+    "tv_command_timeouts_total", "Команды, не получившие ответа в срок", ("device", "command")
+)
+TV_SHARED_READS = Counter(
+    "tv_shared_reads_total", "Запросы чтения, присоединённые к уже выполняющемуся", ("device", "command")
+)
+TV_CONNECT_FAILURES = Counter("tv_connect_failures_total", "Неудачные попытки подключения", ("device",))
+TV_CONNECTS = Counter("tv_connects_total", "Успешные подключения к телевизору", ("device",))
+TV_CONNECTED = Gauge("tv_connected", "1, если соединение с телевизором установлено", ("device",))
+TV_UPTIME = Gauge("tv_connection_uptime_seconds", "Время жизни текущего соединения", ("device",))
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запроса", ("method", "route", "status")
+)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время обработки HTTP-запросов по шаблону маршрута.
+
+    prefixes — шаблоны префиксов подключённых роутеров по имени параметра пути,
+    например {"device_id": "/tv/{device_id}"}: FastAPI отдаёт в scope маршрут
+    исходного роутера без префикса.
+    """
+
+    def __init__(self, app, prefixes=None):
+        self.app = app
+        self.prefixes = prefixes or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Шаблон маршрута вместо пути, чтобы не плодить метки на каждый device_id и значение
+            path = getattr(scope.get("route"), "path", "unmatched")
+            for param, prefix in self.prefixes.items():
+                if param in scope.get("path_params", {}) and not path.startswith(prefix):
+                    path = prefix + path
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, scope["method"], path, status)
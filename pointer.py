@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+import os
+
+import websockets
+
+POINTER_SOCKET_URI = "ssap://com.webos.service.networkinput/getPointerInputSocket"
+# Интервал, за который перемещения курсора склеиваются в одно сообщение
+MOVE_INTERVAL = float(os.getenv("POINTER_MOVE_INTERVAL") or 0.016)
+
+# Кнопки пульта, которые принимает сокет ввода
+BUTTONS = {
+    "HOME", "BACK", "EXIT", "MENU", "INFO", "DASH", "ENTER",
+    "UP", "DOWN", "LEFT", "RIGHT",
+    "RED", "GREEN", "YELLOW", "BLUE",
+    "VOLUMEUP", "VOLUMEDOWN", "MUTE", "CHANNELUP", "CHANNELDOWN",
+    "PLAY", "PAUSE", "STOP", "REWIND", "FASTFORWARD",
+    "ASTERISK", "CC", "0", "1", "2", "3", "4", "5", "6", "7", "8", "9",
+}
+
+
+class PointerSocket:
+    """Вторичный сокет ввода телевизора: кнопки пульта и курсор.
+
+    Адрес сокета запрашивается у телевизора один раз и переиспользуется; сообщения
+    пишутся напрямую, без ожидания ответа. Перемещения курсора накапливаются и
+    уходят одним сообщением раз в move_interval.
+    """
+
+    def __init__(self, tv, move_interval=MOVE_INTERVAL):
+        self.tv = tv
+        self.move_interval = move_interval
+        self.websocket = None
+        self.lock = asyncio.Lock()
+        self.dx = 0
+        self.dy = 0
+        self.drag = False
+        self.flush_task = None
+
+    async def _connect(self):
+        async with self.lock:
+            if self.websocket is None:
+                response = await self.tv.send_command("Получить socket курсора", POINTER_SOCKET_URI, {}, read_only=True)
+                socket_path = json.loads(response)["payload"]["socketPath"]
+                self.websocket = await websockets.connect(socket_path, open_timeout=self.tv.connect_timeout)
+                logging.info("Подключен сокет ввода")
+            return self.websocket
+
+    async def _send(self, message):
+        # Одна повторная попытка: сокет мог закрыться вместе с основным соединением
+        for attempt in range(2):
+            websocket = await self._connect()
+            try:
+                await websocket.send(message)
+                return
+            except websockets.exceptions.ConnectionClosed:
+                if self.websocket is websocket:
+                    self.websocket = None
+                if attempt:
+                    raise ConnectionError("Сокет ввода закрыт")
+
+    async def button(self, name):
+        await self.flush()
+        await self._send(f"type:button\nname:{name}\n\n")
+
+    async def click(self):
+        await self.flush()
+        await self._send("type:click\n\n")
+
+    async def scroll(self, dx, dy):
+        await self.flush()
+        await self._send(f"type:scroll\ndx:{dx}\ndy:{dy}\n\n")
+
+    def move(self, dx, dy, drag=False):
+        """Добавить перемещение курсора; отправка — в ближайшем окне склейки."""
+        self.dx += dx
+        self.dy += dy
+        self.drag = self.drag or drag
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.move_interval)
+        self.flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.warning("Не удалось отправить перемещение курсора: %s", e)
+
+    async def flush(self):
+        """Немедленная отправка накопленного перемещения."""
+        if not self.dx and not self.dy:
+            return
+        dx, dy, drag = self.dx, self.dy, self.drag
+        self.dx, self.dy, self.drag = 0, 0, False
+        await self._send(f"type:move\ndx:{dx}\ndy:{dy}\ndown:{int(drag)}\n\n")
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        if self.websocket is not None:
+            await self.websocket.close()
+            self.websocket = None
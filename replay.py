@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+
+import capture
+from bench import percentile
+from scheduler import QUEUE_SIZE, RATE_BURST, CommandScheduler, TVBusyError
+from websocket import LGWebOSClient
+
+
+def load(path, device=None):
+    """Записи трафика из файла CAPTURE_FILE в порядке отправки."""
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if device is None or entry["device"] == device:
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries
+
+
+async def replay(tv, entries, speed):
+    """Повтор команд с исходными интервалами, ускоренными в speed раз (0 — без пауз).
+
+    Возвращает время ответа и исход для каждой записи: ok, error или busy (отказ очереди).
+    """
+    results = [None] * len(entries)
+    first = entries[0]["ts"]
+    started = time.perf_counter()
+
+    async def one(i, entry):
+        if speed:
+            await asyncio.sleep(max(0.0, (entry["ts"] - first) / speed - (time.perf_counter() - started)))
+        began = time.perf_counter()
+        try:
+            await tv.send_command(entry["command"], entry["uri"], json.dumps(entry["payload"]),
+                                  read_only=entry["read_only"])
+            outcome = "ok"
+        except TVBusyError:
+            outcome = "busy"
+        except Exception:
+            outcome = "error"
+        results[i] = (time.perf_counter() - began, outcome)
+
+    await asyncio.gather(*(one(i, entry) for i, entry in enumerate(entries)))
+    return results, time.perf_counter() - started
+
+
+def report(entries, results, elapsed):
+    recorded_span = entries[-1]["ts"] - entries[0]["ts"]
+    print(f"Команд: {len(entries)}, исходная длительность: {recorded_span:.2f} с, повтор: {elapsed:.2f} с")
+    print(
+        f"{'команда':32} {'n':>6} {'ошибки':>14} {'занято':>6} {'p50 мс':>16} {'p95 мс':>16} "
+        f"{'Δp50 мс':>9} {'Δp95 мс':>9}"
+    )
+
+    grouped = {}
+    for entry, (latency, outcome) in zip(entries, results):
+        grouped.setdefault(entry["command"], []).append((entry, latency, outcome))
+    for command, rows in sorted(grouped.items()):
+        recorded = sorted(entry["elapsed"] for entry, _, _ in rows)
+        # Отказы очереди приходят сразу и не относятся к задержке телевизора
+        replayed = sorted(latency for _, latency, outcome in rows if outcome != "busy")
+        recorded_errors = sum(entry["error"] is not None for entry, _, _ in rows)
+        replayed_errors = sum(outcome == "error" for _, _, outcome in rows)
+        busy = sum(outcome == "busy" for _, _, outcome in rows)
+        was = [percentile(recorded, q) * 1000 for q in (50, 95)]
+        now = [percentile(replayed, q) * 1000 if replayed else math.nan for q in (50, 95)]
+        print(
+            f"{command:32} {len(rows):>6} {recorded_errors:>6} → {replayed_errors:<5} {busy:>6} "
+            f"{was[0]:>7.2f} → {now[0]:<6.2f} {was[1]:>7.2f} → {now[1]:<6.2f} "
+            f"{now[0] - was[0]:>+9.2f} {now[1] - was[1]:>+9.2f}"
+        )
+
+
+async def main(args):
+    entries = load(args.file, args.device)
+    if not entries:
+        print("Нет записей для повтора")
+        return
+
+    mock = None
+    if args.mock is not None:
+        mock = subprocess.Popen(
+            [sys.executable, "ws_test.py", "--port", str(args.port), "--log-level", "WARNING", *shlex.split(args.mock)]
+        )
+        await asyncio.sleep(1)
+
+    # Ключ мок-телевизора не должен попасть в файл ключа настоящего
+    tv = LGWebOSClient(args.host, args.port, os.path.join(tempfile.gettempdir(), "client_key_replay.json"))
+    # По умолчанию очередь не ограничивает повтор: задержки — только телевизора.
+    # С --max-in-flight/--rate действуют они и размер очереди TV_QUEUE_SIZE
+    unbounded = len(entries)
+    limited = bool(args.max_in_flight or args.rate)
+    tv.scheduler = CommandScheduler(
+        max_in_flight=args.max_in_flight or unbounded,
+        rate=args.rate or unbounded,
+        burst=RATE_BURST if args.rate else unbounded,
+        queue_size=QUEUE_SIZE if limited else unbounded,
+    )
+    try:
+        await tv.connect()
+        results, elapsed = await replay(tv, entries, args.speed)
+        report(entries, results, elapsed)
+    finally:
+        await tv.close()
+        if mock is not None:
+            mock.terminate()
+            mock.wait()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Повтор записанного трафика (CAPTURE_FILE) на мок-телевизоре")
+    parser.add_argument("file", help="файл записи трафика")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--speed", type=float, default=1,
+                        help="ускорение относительно записи (1 — исходный темп, 0 — без пауз)")
+    parser.add_argument("--device", help="повторять только команды этого телевизора")
+    parser.add_argument("--mock", nargs="?", const="", default=None,
+                        help='запустить ws_test.py с аргументами, например --mock "--latency 0.05"')
+    parser.add_argument("--max-in-flight", type=int, default=0,
+                        help="ограничение команд в ожидании ответа, как TV_MAX_IN_FLIGHT (0 — без ограничения)")
+    parser.add_argument("--rate", type=float, default=0,
+                        help="ограничение команд в секунду, как TV_RATE_LIMIT (0 — без ограничения)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    # Повтор не должен записываться поверх исходного трафика
+    capture.recorder = None
+    asyncio.run(main(parse_args()))
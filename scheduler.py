@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import math
+import os
+import time
+
+# Классы приоритета: управление раньше чтения состояния
+PRIORITY_CONTROL = 0
+PRIORITY_READ = 1
+
+# Ограничения нагрузки на телевизор
+MAX_IN_FLIGHT = int(os.getenv("TV_MAX_IN_FLIGHT") or 8)
+RATE_LIMIT = float(os.getenv("TV_RATE_LIMIT") or 20)
+RATE_BURST = int(os.getenv("TV_RATE_BURST") or 10)
+QUEUE_SIZE = int(os.getenv("TV_QUEUE_SIZE") or 100)
+
+
+class TVBusyError(Exception):
+    """Очередь команд к телевизору переполнена; retry_after — через сколько секунд повторить."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CommandScheduler:
+    """Очередь команд к телевизору с приоритетами и ограничением нагрузки.
+
+    Команда получает слот, когда свободно место среди max_in_flight ожидающих
+    ответа и есть токен в ведре rate/burst. Ждущие обслуживаются по приоритету,
+    внутри класса — по порядку; при заполненной очереди класса — TVBusyError.
+    """
+
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT, rate=RATE_LIMIT, burst=RATE_BURST, queue_size=QUEUE_SIZE):
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.burst = burst
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self.tokens = float(burst)
+        self.refilled_at = time.monotonic()
+        self.queues = {PRIORITY_CONTROL: collections.deque(), PRIORITY_READ: collections.deque()}
+        self.timer = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+
+    def _can_start(self):
+        self._refill()
+        return self.in_flight < self.max_in_flight and self.tokens >= 1
+
+    def _take(self):
+        self.tokens -= 1
+        self.in_flight += 1
+
+    def waiting(self):
+        return sum(len(queue) for queue in self.queues.values())
+
+    async def acquire(self, priority=PRIORITY_READ):
+        """Ожидание слота для отправки команды; TVBusyError, если очередь заполнена."""
+        if not self.waiting() and self._can_start():
+            self._take()
+            return
+
+        queue = self.queues[priority]
+        if len(queue) >= self.queue_size:
+            retry_after = max(1, math.ceil(self.waiting() / self.rate))
+            raise TVBusyError("Очередь команд к телевизору переполнена", retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self._schedule()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Слот мог быть выдан одновременно с отменой — возвращаем его
+                self.release()
+            elif future in queue:
+                # Ушедший по отмене или сроку не должен занимать место в очереди
+                queue.remove(future)
+            raise
+
+    def release(self):
+        """Команда получила ответ или не была отправлена: слот свободен."""
+        self.in_flight -= 1
+        self._grant()
+
+    def _grant(self):
+        """Выдача слотов ждущим, начиная с высшего приоритета."""
+        for priority in sorted(self.queues):
+            queue = self.queues[priority]
+            while queue:
+                if queue[0].done():
+                    queue.popleft()
+                    continue
+                if not self._can_start():
+                    self._schedule()
+                    return
+                self._take()
+                queue.popleft().set_result(None)
+
+    def _schedule(self):
+        """Повторная попытка выдачи, когда в ведре появится токен."""
+        if self.timer is not None or self.in_flight >= self.max_in_flight:
+            return
+        self._refill()
+        delay = max(0.0, (1 - self.tokens) / self.rate)
+        self.timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self.timer = None
+        self._grant()
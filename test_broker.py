@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+import websockets
+
+import broker
+import ws_test
+from commands import CommandEnum
+from devices import TVRegistry
+from websocket import TVTimeoutError
+
+
+def test_worker_deadline_reaches_broker(tmp_path):
+    async def scenario():
+        ws_test.config["silent_rate"] = 1
+        server = await websockets.serve(ws_test.handle_client, "localhost", 0)
+        port = server.sockets[0].getsockname()[1]
+        devices = {"tv": {"ip": "localhost", "port": port, "client_key_file": str(tmp_path / "client_key.json")}}
+        registry = TVRegistry(devices)
+        path = str(tmp_path / "broker.sock")
+        serving = asyncio.create_task(broker.serve(registry, path))
+        worker = TVRegistry(devices, broker_socket=path).get()
+        try:
+            await asyncio.sleep(0.2)
+            await worker.connect()
+            with pytest.raises(TVTimeoutError):
+                await worker.send_command(*CommandEnum.PLAY.with_payload(), timeout=0.3)
+            await asyncio.sleep(0.1)
+            # Брокер снял команду по сроку воркера, а не по своему таймауту
+            return registry.get().scheduler.in_flight
+        finally:
+            ws_test.config["silent_rate"] = 0
+            await worker.close()
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_volume_steps_from_workers_add_up(tmp_path):
+    async def scenario():
+        server = await websockets.serve(ws_test.handle_client, "localhost", 0)
+        port = server.sockets[0].getsockname()[1]
+        devices = {"tv": {"ip": "localhost", "port": port, "client_key_file": str(tmp_path / "client_key.json")}}
+        path = str(tmp_path / "broker.sock")
+        serving = asyncio.create_task(broker.serve(TVRegistry(devices), path))
+        workers = [TVRegistry(devices, broker_socket=path).get() for _ in range(2)]
+        try:
+            await asyncio.sleep(0.2)
+            for worker in workers:
+                await worker.connect()
+            before = ws_test.tv_state["volume"]
+            # Каждый воркер склеивает свои шаги, но итог считает брокер
+            coalescers = [broker.BrokeredVolumeCoalescer(worker, max_age=30) for worker in workers]
+            await asyncio.gather(*(coalescer.step(1) for coalescer in coalescers for _ in range(3)))
+            return ws_test.tv_state["volume"] - before
+        finally:
+            for worker in workers:
+                await worker.close()
+            serving.cancel()
+            await asyncio.gather(serving, return_exceptions=True)
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(scenario()) == 6
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from scheduler import CommandScheduler, TVBusyError
+
+
+def test_cancelled_waiters_leave_the_queue():
+    async def scenario():
+        scheduler = CommandScheduler(max_in_flight=1, rate=1000, burst=1000, queue_size=2)
+        await scheduler.acquire()
+        waiters = [asyncio.create_task(scheduler.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Очередь свободна: новая команда ждёт слота, а не получает TVBusyError
+        waiting = scheduler.waiting()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        scheduler.release()
+        await waiter
+        return waiting
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_full_queue_is_busy():
+    async def scenario():
+        scheduler = CommandScheduler(max_in_flight=1, rate=1000, burst=1000, queue_size=1)
+        await scheduler.acquire()
+        waiter = asyncio.create_task(scheduler.acquire())
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(TVBusyError):
+                await scheduler.acquire()
+        finally:
+            waiter.cancel()
+
+    asyncio.run(scenario())
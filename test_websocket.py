@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import websockets
+
+import ws_test
+from commands import CommandEnum
+from scheduler import CommandScheduler
+from websocket import LGWebOSClient, TVTimeoutError
+
+
+async def with_client(tmp_path, scenario, max_in_flight=2):
+    """Клиент, подключенный к мок-телевизору на свободном порту."""
+    server = await websockets.serve(ws_test.handle_client, "localhost", 0)
+    port = server.sockets[0].getsockname()[1]
+    tv = LGWebOSClient("localhost", port, str(tmp_path / "client_key.json"))
+    tv.scheduler = CommandScheduler(max_in_flight=max_in_flight, rate=1000, burst=1000)
+    try:
+        await tv.connect()
+        return await scenario(tv)
+    finally:
+        await tv.close()
+        server.close()
+        await server.wait_closed()
+
+
+def test_pipelined_batch_larger_than_max_in_flight(tmp_path):
+    async def scenario(tv):
+        commands = [CommandEnum.PLAY.with_payload()] * 5
+        return await tv.send_pipelined(commands, timeout=3)
+
+    responses = asyncio.run(with_client(tmp_path, scenario))
+    assert [json.loads(response)["type"] for response in responses] == ["response"] * 5
+
+
+def test_cancelled_pipelined_batch_releases_slots(tmp_path):
+    async def scenario(tv):
+        ws_test.config["latency"] = 0.2
+        try:
+            batch = asyncio.create_task(tv.send_pipelined([CommandEnum.PLAY.with_payload()] * 6, timeout=5))
+            await asyncio.sleep(0.1)
+            batch.cancel()
+            await asyncio.gather(batch, return_exceptions=True)
+        finally:
+            ws_test.config["latency"] = 0
+        return tv.scheduler.in_flight, len(tv.pending)
+
+    assert asyncio.run(with_client(tmp_path, scenario)) == (0, 0)
+
+
+def test_pipelined_batch_cancelled_after_dispatch_releases_slots(tmp_path):
+    async def scenario(tv):
+        ws_test.config["latency"] = 0.2
+        try:
+            batch = asyncio.create_task(tv.send_pipelined([CommandEnum.PLAY.with_payload()] * 3, timeout=5))
+            # Все кадры отправлены, задачи ожидания ответов ещё не начали выполняться
+            while len(tv.pending) < 3:
+                await asyncio.sleep(0)
+            batch.cancel()
+            await asyncio.gather(batch, return_exceptions=True)
+            await asyncio.sleep(0)
+        finally:
+            ws_test.config["latency"] = 0
+        return tv.scheduler.in_flight, len(tv.pending)
+
+    assert asyncio.run(with_client(tmp_path, scenario, max_in_flight=4)) == (0, 0)
+
+
+def test_shared_read_outlives_short_deadline(tmp_path):
+    async def scenario(tv):
+        ws_test.config["latency"] = 0.3
+        try:
+            command = (*CommandEnum.VOLUME_STATUS.with_payload(), True)
+            # Одинаковые чтения объединяются; короткий срок одного не решает за другого
+            return await asyncio.gather(
+                tv.send_command(*command, timeout=0.05),
+                tv.send_command(*command, timeout=5),
+                return_exceptions=True,
+            )
+        finally:
+            ws_test.config["latency"] = 0
+
+    short, long = asyncio.run(with_client(tmp_path, scenario))
+    assert isinstance(short, TVTimeoutError)
+    assert json.loads(long)["type"] == "response"
+
+
+def test_optimistic_update_reaches_listeners(tmp_path):
+    async def scenario():
+        tv = LGWebOSClient("localhost", 0, str(tmp_path / "client_key.json"))
+        uri = CommandEnum.VOLUME_STATUS.uri
+        tv._update_state(uri, {"payload": {"volume": 40, "mute": False}})
+        queue = tv.add_listener()
+        tv.update_state(uri, {"volume": 41})
+        # Push телевизора с тем же значением, что и оптимистичное обновление
+        tv._update_state(uri, {"payload": {"volume": 41, "mute": False}})
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    assert asyncio.run(scenario()) == [(CommandEnum.VOLUME_STATUS.uri, {"volume": 41, "mute": False})]
+
+
+def test_short_lived_sessions_back_off(tmp_path):
+    async def scenario():
+        handshakes = 0
+
+        async def handler(websocket):
+            nonlocal handshakes
+            handshakes += 1
+            await ws_test.handle_client(websocket)
+
+        ws_test.config["drop_rate"] = 1
+        server = await websockets.serve(handler, "localhost", 0)
+        port = server.sockets[0].getsockname()[1]
+        tv = LGWebOSClient("localhost", port, str(tmp_path / "client_key.json"))
+        tv.base_delay, tv.max_delay = 0.1, 0.4
+        try:
+            tv.start()
+            await asyncio.sleep(1)
+            # Телевизор закрывает каждое соединение сразу после регистрации
+            return handshakes, tv.circuit_open()
+        finally:
+            ws_test.config["drop_rate"] = 0
+            await tv.close()
+            server.close()
+            await server.wait_closed()
+
+    handshakes, circuit_open = asyncio.run(scenario())
+    assert handshakes < 10
+    assert circuit_open
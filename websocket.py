@@ -1,17 +1,23 @@
 import asyncio
+import functools
+import itertools
 import json
 import logging
+import math
 import os
+import random
+import time
 from dotenv import load_dotenv
 
 
 import websockets
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[logging.StreamHandler()]
-)
+import capture
+import logs
+import metrics
+from logs import MESSAGE_LOG
+from pointer import PointerSocket
+from scheduler import PRIORITY_CONTROL, PRIORITY_READ, CommandScheduler, TVBusyError
 
 load_dotenv()
 
@@ -19,136 +25,623 @@ TV_IP = os.getenv("TV_IP") or "localhost"
 PORT = 3000
 CLIENT_KEY_FILE = "client_key.json"
 
+# Подключение: таймаут рукопожатия, задержки переподключения и порог размыкания цепи
+CONNECT_TIMEOUT = float(os.getenv("TV_CONNECT_TIMEOUT") or 5)
+REGISTER_TIMEOUT = float(os.getenv("TV_REGISTER_TIMEOUT") or 60)
+RECONNECT_BASE_DELAY = float(os.getenv("TV_RECONNECT_BASE_DELAY") or 0.5)
+RECONNECT_MAX_DELAY = float(os.getenv("TV_RECONNECT_MAX_DELAY") or 30)
+FAILURE_THRESHOLD = int(os.getenv("TV_FAILURE_THRESHOLD") or 1)
+# Сколько по умолчанию ждать ответа телевизора на команду, включая очередь
+COMMAND_TIMEOUT = float(os.getenv("TV_COMMAND_TIMEOUT") or 10)
+# Heartbeat: интервал ping и время ожидания pong
+HEARTBEAT_INTERVAL = float(os.getenv("TV_HEARTBEAT_INTERVAL") or 10)
+HEARTBEAT_TIMEOUT = float(os.getenv("TV_HEARTBEAT_TIMEOUT") or 10)
+# Соединение, прожившее меньше, считается неудачной попыткой: переподключение с задержкой
+STABLE_CONNECTION = float(os.getenv("TV_STABLE_CONNECTION") or HEARTBEAT_INTERVAL)
+
+# Состояние, которое телевизор сам присылает по подписке
+STATE_SUBSCRIPTIONS = (
+    "ssap://audio/getStatus",
+    "ssap://com.webos.service.tvpower/power/getPowerState",
+    "ssap://com.webos.applicationManager/getForegroundAppInfo",
+)
+# Сколько непрочитанных изменений состояния хранится для одного слушателя
+LISTENER_QUEUE_SIZE = 100
+
+@functools.lru_cache(maxsize=None)
+def frame_prefix(uri):
+    """Неизменная часть кадра запроса: сериализуется один раз на uri."""
+    return '{"type": "request", "uri": ' + json.dumps(uri) + ', "id": "'
+
+
+def command_label(uri):
+    """Метка команды для метрик: путь ssap, как в каталоге команд."""
+    return uri.removeprefix("ssap://")
+
+
+def encode_payload(payload):
+    """JSON payload; уже сериализованная строка используется как есть."""
+    return payload if isinstance(payload, str) else json.dumps(payload)
+
+
+class TVUnavailableError(ConnectionError):
+    """Телевизор недоступен; retry_after — через сколько секунд имеет смысл повторить."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TVTimeoutError(TimeoutError):
+    """Телевизор не ответил на команду за отведённое время."""
+
+
 class LGWebOSClient:
-    def __init__(self, ip=TV_IP, port=PORT, client_key_file=CLIENT_KEY_FILE):
+    def __init__(self, ip=TV_IP, port=PORT, client_key_file=CLIENT_KEY_FILE, subscriptions=STATE_SUBSCRIPTIONS,
+                 name=None):
         self.ip = ip
+        # Имя телевизора в метриках и логах
+        self.name = name or ip
         self.port = port
         self.client_key_file = client_key_file
+        self.client_key = self._load_client_key()
+        self.save_task = None
         self.websocket = None
         self.connected = False
-        self.connecting = False
+        # Событие завершения очередной попытки подключения (успешной или нет)
+        self.attempt_done = asyncio.Event()
         self.reconnect_tries = 0
-        self.max_retries = 5
-        self.lock = asyncio.Lock()
-
-    async def connect(self):
-        """Подключение к WebSocket серверу."""
-        print(self.ip)
-        async with self.lock:
-            if self.connected or self.connecting:
+        self.supervisor_task = None
+        self.connect_timeout = CONNECT_TIMEOUT
+        self.command_timeout = COMMAND_TIMEOUT
+        self.heartbeat_interval = HEARTBEAT_INTERVAL
+        self.heartbeat_timeout = HEARTBEAT_TIMEOUT
+        self.stable_connection = STABLE_CONNECTION
+        self.base_delay = RECONNECT_BASE_DELAY
+        self.max_delay = RECONNECT_MAX_DELAY
+        self.failure_threshold = FAILURE_THRESHOLD
+        # Подряд неудачных попыток подключения и время следующей попытки
+        self.failures = 0
+        self.retry_at = 0.0
+        self.connected_since = None
+        # Ожидающие ответа запросы: id запроса -> (websocket, Future)
+        self.pending = {}
+        self.request_ids = itertools.count(1)
+        self.reader_task = None
+        # Приоритеты и ограничение темпа команд к телевизору
+        self.scheduler = CommandScheduler()
+        # Выполняющиеся запросы чтения: (uri, payload) -> Task; Task -> сколько вызывающих его ждут
+        self.inflight = {}
+        self.read_waiters = {}
+        # Подписки: id подписки -> uri; кэш состояния: uri -> payload
+        self.subscribe_uris = tuple(subscriptions)
+        self.subscriptions = {}
+        self.state = {}
+        self.state_updated = {}
+        self.state_waiters = {}
+        # Очереди слушателей состояния (SSE/WebSocket клиенты, брокер) -> нужны ли все обновления
+        self.listeners = {}
+        # Сокет ввода для кнопок и курсора, подключается при первом использовании
+        self.pointer = PointerSocket(self)
+
+    def _load_client_key(self):
+        """Ключ сопряжения с диска; читается один раз, дальше живёт в памяти."""
+        if not os.path.exists(self.client_key_file):
+            return None
+        with open(self.client_key_file, "r") as f:
+            return json.load(f).get("client-key")
+
+    def _save_client_key(self, client_key):
+        with open(self.client_key_file, "w") as f:
+            json.dump({"client-key": client_key}, f)
+
+    def _register_message(self):
+        """Сообщение регистрации: с сохранённым ключом или с запросом сопряжения."""
+        if self.client_key:
+            return {
+                "type": "register",
+                "id": "register_0",
+                "payload": {"client-key": self.client_key}
+            }
+        else:
+            return {
+                "type": "register",
+                "id": "register_0",
+                "payload": {
+                    "forcePairing": False,
+                    "pairingType": "PROMPT",
+                    "manifest": {
+                        "manifestVersion": 1,
+                        "appVersion": "1.1",
+                        "signed": {
+                            "created": "20140509",
+                            "appId": "com.lge.test",
+                            "vendorId": "com.lge",
+                            "localizedAppNames": {"": "LG Remote App"},
+                            "localizedVendorNames": {"": "LG Electronics"},
+                            "serial": "2f930e2d2cfe083771f68e4fe7bb07"
+                        },
+                        "permissions": [
+                            "LAUNCH", "LAUNCH_WEBAPP", "APP_TO_APP", "CLOSE", "TEST_OPEN", "TEST_PROTECTED",
+                            "CONTROL_AUDIO", "CONTROL_DISPLAY", "CONTROL_INPUT_JOYSTICK",
+                            "CONTROL_INPUT_MEDIA_RECORDING",
+                            "CONTROL_INPUT_MEDIA_PLAYBACK", "CONTROL_INPUT_TV", "CONTROL_POWER",
+                            "READ_APP_STATUS",
+                            "READ_CURRENT_CHANNEL", "READ_INPUT_DEVICE_LIST", "READ_NETWORK_STATE",
+                            "READ_RUNNING_APPS",
+                            "READ_TV_CHANNEL_LIST", "WRITE_NOTIFICATION_TOAST", "READ_POWER_STATE",
+                            "READ_COUNTRY_INFO",
+                            "READ_INSTALLED_APPS", "CONTROL_INPUT", "CONTROL_INPUT_KEYBOARD",
+                            "CONTROL_INPUT_TEXT"
+                        ]
+                    }
+                }
+            }
+
+    async def _transport(self):
+        """Новое соединение с телевизором."""
+        uri = f"ws://{self.ip}:{self.port}"
+        logging.info("🔌 Подключение к %s", uri)
+        # Встроенный keepalive websockets пингует сокет и закрывает его, если телевизор не отвечает
+        return await websockets.connect(
+            uri,
+            open_timeout=self.connect_timeout,
+            ping_interval=self.heartbeat_interval,
+            ping_timeout=self.heartbeat_timeout,
+        )
+
+    async def _open(self):
+        """Одна попытка подключения и регистрации на телевизоре."""
+        websocket = await self._transport()
+        try:
+            await websocket.send(json.dumps(self._register_message()))
+            await asyncio.wait_for(self._await_registered(websocket), REGISTER_TIMEOUT)
+        except BaseException:
+            await websocket.close()
+            raise
+
+        self.websocket = websocket
+        self.connected = True
+        self.connected_since = time.monotonic()
+        metrics.TV_CONNECTS.inc(self.name)
+        self.reader_task = asyncio.create_task(self._reader(websocket))
+        await self._subscribe(websocket)
+        logging.info("Успешное подключение к телевизору %s", self.name)
+
+    async def _await_registered(self, websocket):
+        """Ожидание ответа registered; сохраняет выданный телевизором ключ."""
+        async for message in websocket:
+            MESSAGE_LOG.debug("Получено: %.500s", message)
+            data = json.loads(message)
+
+            # Ответ на ping
+            if data.get("type") == "ping":
+                await websocket.send(json.dumps({"type": "pong"}))
+                continue
+
+            if data.get("type") == "registered":
+                client_key = data.get("payload", {}).get("client-key")
+                if client_key and client_key != self.client_key:
+                    self.client_key = client_key
+                    # Запись на диск не задерживает подключение
+                    self.save_task = asyncio.create_task(asyncio.to_thread(self._save_client_key, client_key))
                 return
+        raise ConnectionError("Телевизор закрыл соединение до регистрации")
 
-            self.connecting = True
-            for _ in range(self.max_retries):
-                try:
-                    uri = f"ws://{self.ip}:{self.port}"
-                    logging.info(f"🔌 Подключение к {uri}")
-                    self.websocket = await websockets.connect(uri)
-
-                    if os.path.exists(self.client_key_file):
-                        with open(self.client_key_file, "r") as f:
-                            client_key = json.load(f).get("client-key")
-                        register_msg = {
-                            "type": "register",
-                            "id": "register_0",
-                            "payload": {"client-key": client_key}
-                        }
-                    else:
-                        register_msg = {
-                            "type": "register",
-                            "id": "register_0",
-                            "payload": {
-                                "forcePairing": False,
-                                "pairingType": "PROMPT",
-                                "manifest": {
-                                    "manifestVersion": 1,
-                                    "appVersion": "1.1",
-                                    "signed": {
-                                        "created": "20140509",
-                                        "appId": "com.lge.test",
-                                        "vendorId": "com.lge",
-                                        "localizedAppNames": {"": "LG Remote App"},
-                                        "localizedVendorNames": {"": "LG Electronics"},
-                                        "serial": "2f930e2d2cfe083771f68e4fe7bb07"
-                                    },
-                                    "permissions": [
-                                        "LAUNCH", "LAUNCH_WEBAPP", "APP_TO_APP", "CLOSE", "TEST_OPEN", "TEST_PROTECTED",
-                                        "CONTROL_AUDIO", "CONTROL_DISPLAY", "CONTROL_INPUT_JOYSTICK",
-                                        "CONTROL_INPUT_MEDIA_RECORDING",
-                                        "CONTROL_INPUT_MEDIA_PLAYBACK", "CONTROL_INPUT_TV", "CONTROL_POWER",
-                                        "READ_APP_STATUS",
-                                        "READ_CURRENT_CHANNEL", "READ_INPUT_DEVICE_LIST", "READ_NETWORK_STATE",
-                                        "READ_RUNNING_APPS",
-                                        "READ_TV_CHANNEL_LIST", "WRITE_NOTIFICATION_TOAST", "READ_POWER_STATE",
-                                        "READ_COUNTRY_INFO",
-                                        "READ_INSTALLED_APPS", "CONTROL_INPUT", "CONTROL_INPUT_KEYBOARD",
-                                        "CONTROL_INPUT_TEXT"
-                                    ]
-                                }
-                            }
-                        }
-
-                    await self.websocket.send(json.dumps(register_msg))
-
-                    async for message in self.websocket:
-                        data = json.loads(message)
-                        logging.info(f"Получено: {data}")
-
-                        # Ответ на ping
-                        if data.get("type") == "ping":
-                            await self.websocket.send(json.dumps({"type": "pong"}))
-                            logging.info("Отправлен pong")
-                            continue
-
-                        if data.get("type") == "registered":
-                            client_key = data.get("payload", {}).get("client-key")
-                            if client_key:
-                                with open(self.client_key_file, "w") as f:
-                                    json.dump({"client-key": client_key}, f)
-                            break
-                    self.connected = True
-                    logging.info("Успешное подключение к телевизору")
-                    break
-                except Exception as e:
-                    logging.warning(f"Ошибка подключения: {e}")
-                    await asyncio.sleep(3)
-                    self.reconnect_tries += 1
-            self.connecting = False
-
-    async def send_command(self, command_name, uri, payload):
-        """Отправка команды на телевизор."""
-        # Проверка состояния подключения
-        if not self.connected:
-            logging.info("WebSocket не подключен, пытаемся переподключиться...")
-            await self.connect()
+    def _backoff(self):
+        """Экспоненциальная задержка с равным джиттером: случайная, от половины до полной."""
+        delay = min(self.max_delay, self.base_delay * 2 ** min(self.failures - 1, 16))
+        return random.uniform(delay / 2, delay)
+
+    def _attempt_finished(self):
+        """Будит всех, кто ждёт результата текущей попытки подключения."""
+        self.attempt_done.set()
+        self.attempt_done = asyncio.Event()
+
+    async def _retry_later(self, reason):
+        """Неудачная попытка: пауза перед следующей растёт с числом неудач подряд."""
+        self.failures += 1
+        self.reconnect_tries += 1
+        metrics.TV_CONNECT_FAILURES.inc(self.name)
+        delay = self._backoff()
+        self.retry_at = time.monotonic() + delay
+        logging.warning("Ошибка подключения к %s: %s; повтор через %.1f с", self.name, reason, delay)
+        self._attempt_finished()
+        await asyncio.sleep(delay)
+
+    async def _supervise(self):
+        """Фоновое поддержание соединения: переподключение с нарастающей задержкой."""
+        while True:
+            try:
+                await self._open()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._retry_later(e)
+                continue
+
+            self._attempt_finished()
+            await asyncio.shield(self.reader_task)
+            lived = time.monotonic() - self.connected_since
+            if lived < self.stable_connection:
+                # Телевизор принял подключение и сразу его закрыл (например, уходя в дежурный
+                # режим): это неудача, иначе переподключение шло бы без паузы по кругу
+                await self._retry_later(f"соединение закрыто через {lived:.1f} с")
+                continue
+            # Соединение было устойчивым: счётчик неудач сбрасывается, переподключение сразу
+            self.failures = 0
+            logging.warning("Соединение с телевизором %s потеряно, переподключение...", self.name)
+
+    def circuit_open(self):
+        """Телевизор заведомо недоступен: запросы отклоняются без попытки подключения."""
+        return not self.connected and self.failures >= self.failure_threshold
+
+    def retry_after(self):
+        """Через сколько секунд будет следующая попытка подключения."""
+        return max(1, math.ceil(self.retry_at - time.monotonic()))
+
+    def start(self):
+        """Запуск фонового подключения без ожидания."""
+        if self.supervisor_task is None or self.supervisor_task.done():
+            self.supervisor_task = asyncio.create_task(self._supervise())
+
+    async def connect(self, timeout=None):
+        """Запуск фонового подключения и ожидание ближайшей попытки не дольше timeout."""
+        self.start()
+        if self.connected:
+            return
+        try:
+            await asyncio.wait_for(self.attempt_done.wait(), timeout or self.connect_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def close(self):
+        """Остановка фонового подключения и закрытие сокета."""
+        if self.supervisor_task is not None:
+            self.supervisor_task.cancel()
+            self.supervisor_task = None
+        await self.pointer.close()
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.save_task is not None:
+            await self.save_task
+
+    async def _subscribe(self, websocket):
+        """Подписка на изменения состояния телевизора."""
+        self.subscriptions.clear()
+        for uri in self.subscribe_uris:
+            subscription_id = f"sub_{next(self.request_ids)}"
+            self.subscriptions[subscription_id] = uri
+            await websocket.send(json.dumps({"type": "subscribe", "id": subscription_id, "uri": uri}))
+
+    def _update_state(self, uri, data):
+        """Обновление кэша состояния из ответа или push-сообщения."""
+        payload = data.get("payload")
+        if data.get("type") == "error" or not isinstance(payload, dict):
+            return
+        changed = self.state.get(uri) != payload
+        self.state[uri] = payload
+        self.state_updated[uri] = time.monotonic()
+        for future in self.state_waiters.pop(uri, []):
+            if not future.done():
+                future.set_result(payload)
+        for queue, all_updates in self.listeners.items():
+            if changed or all_updates:
+                self._notify(queue, (uri, payload))
+
+    @staticmethod
+    def _notify(queue, event):
+        # Медленный слушатель теряет самые старые события, а не тормозит остальных
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def add_listener(self, maxsize=LISTENER_QUEUE_SIZE, all_updates=False):
+        """Очередь, в которую будут приходить изменения состояния (uri, payload).
+
+        С all_updates=True в очередь попадает каждое обновление, даже без изменений,
+        а при разрыве соединения с телевизором — (None, None).
+        """
+        queue = asyncio.Queue(maxsize)
+        self.listeners[queue] = all_updates
+        return queue
+
+    def remove_listener(self, queue):
+        self.listeners.pop(queue, None)
+
+    def get_state(self, uri, max_age):
+        """Payload из кэша состояния, если он не старше max_age секунд, иначе None."""
+        updated = self.state_updated.get(uri)
+        if not self.connected or updated is None or time.monotonic() - updated > max_age:
+            return None
+        return self.state[uri]
+
+    def update_state(self, uri, changes):
+        """Оптимистичное обновление кэша после собственной команды; push телевизора его подтвердит.
+
+        Слушатели получают новое значение сразу: совпадающий с ним push телевизора
+        уже не считается изменением.
+        """
+        if uri not in self.state:
+            return
+        payload = {**self.state[uri], **changes}
+        if payload != self.state[uri]:
+            self.state[uri] = payload
+            for queue in self.listeners:
+                self._notify(queue, (uri, payload))
+
+    def watch_state(self, uri):
+        """Future, который получит следующее обновление состояния по uri."""
+        future = asyncio.get_running_loop().create_future()
+        waiters = self.state_waiters.setdefault(uri, [])
+        waiters.append(future)
+        future.add_done_callback(lambda f: f in waiters and waiters.remove(f))
+        return future
+
+    async def _reader(self, websocket):
+        """Фоновое чтение сокета: раздаёт ответы ожидающим запросам по id."""
+        error = None
+        try:
+            async for message in websocket:
+                MESSAGE_LOG.debug("Получено: %.500s", message)
+                data = json.loads(message)
+
+                # Ответ на ping
+                if data.get("type") == "ping":
+                    await websocket.send(json.dumps({"type": "pong"}))
+                    continue
+
+                subscription_uri = self.subscriptions.get(data.get("id"))
+                if subscription_uri is not None:
+                    self._update_state(subscription_uri, data)
+                    continue
+
+                _, future = self.pending.pop(data.get("id"), (None, None))
+                if future is not None and not future.done():
+                    self._resolve(future, message, data)
+            error = ConnectionError("Соединение с телевизором закрыто")
+        except websockets.exceptions.ConnectionClosed as e:
+            error = e
+        except Exception as e:
+            logging.error("Ошибка чтения WebSocket: %s", e)
+            error = ConnectionError(str(e))
+        finally:
+            if self.websocket is websocket:
+                self.connected = False
+                # Кэш без подписки больше не актуален
+                self.state.clear()
+                self.state_updated.clear()
+                for queue, all_updates in self.listeners.items():
+                    if all_updates:
+                        self._notify(queue, (None, None))
+            # Все ожидающие запросы этого соединения получают ошибку
+            for request_id, (owner, future) in list(self.pending.items()):
+                if owner is websocket:
+                    self.pending.pop(request_id, None)
+                    if not future.done():
+                        future.set_exception(error or ConnectionError("Соединение с телевизором закрыто"))
+
+    def _resolve(self, future, message, data):
+        """Передача ответа ожидающему запросу."""
+        future.set_result(message)
+
+    async def _ensure_connected(self):
+        """Ожидание подключения; TVUnavailableError, если телевизор недоступен."""
+        if self.connected:
+            return
+
+        # Телевизор заведомо недоступен: отказ сразу, без ожидания подключения
+        if self.circuit_open():
+            raise TVUnavailableError("Телевизор недоступен", self.retry_after())
+
+        logging.info("WebSocket не подключен, ожидаем подключения...")
+        await self.connect()
 
         # Если по-прежнему не удалось подключиться
         if not self.connected:
-            raise ConnectionError("Не удалось подключиться к телевизору")
+            raise TVUnavailableError("Не удалось подключиться к телевизору", self.retry_after())
+
+    def _frame(self, uri, request_id, payload, deadline):
+        """Кадр запроса ssap; deadline нужен только посредникам вроде брокера."""
+        return f'{frame_prefix(uri)}{request_id}", "payload": {encode_payload(payload)}}}'
 
-        command = {
-            "type": "request",
-            "id": command_name,
-            "uri": uri,
-            "payload": payload
-        }
+    async def _dispatch(self, uri, payload, priority, deadline=None):
+        """Отправка кадра запроса без ожидания ответа; возвращает (id запроса, Future ответа, время отправки).
 
+        Перед отправкой команда ждёт своей очереди в планировщике. Слот освобождается,
+        когда Future ответа завершится (ответом, ошибкой или отменой), даже если ответ
+        так и не начали ждать.
+        """
+        await self.scheduler.acquire(priority)
+        request_id = f"req_{next(self.request_ids)}"
+        logs.command_id.set(request_id)
+        websocket = self.websocket
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = (websocket, future)
+        metrics.TV_COMMANDS_IN_FLIGHT.inc(self.name)
+        future.add_done_callback(lambda _: self._request_done(request_id))
+        started = time.perf_counter()
         try:
-            # Отправка команды
-            await self.websocket.send(json.dumps(command))
+            await websocket.send(self._frame(uri, request_id, payload, deadline))
+        except BaseException:
+            # Читатель мог успеть завершить Future ошибкой разрыва: забираем её, чтобы не было шума в логе
+            if future.done() and not future.cancelled():
+                future.exception()
+            future.cancel()
+            metrics.TV_COMMAND_FAILURES.inc(self.name, command_label(uri))
+            raise
+        return request_id, future, started
 
-            # Ожидание ответа от WebSocket
-            async for message in self.websocket:
-                return message
+    def _request_done(self, request_id):
+        """Запрос больше не ждёт ответа: снимается с ожидания и освобождает слот планировщика."""
+        self.pending.pop(request_id, None)
+        self.scheduler.release()
+        metrics.TV_COMMANDS_IN_FLIGHT.dec(self.name)
+
+    async def _response(self, request, uri):
+        """Ожидание ответа именно на этот запрос; отмена ожидания отменяет и Future ответа."""
+        request_id, future, started = request
+        try:
+            response = await future
+        except BaseException:
+            metrics.TV_COMMAND_FAILURES.inc(self.name, command_label(uri))
+            raise
+        finally:
+            logs.command_id.set(None)
+        metrics.TV_COMMAND_SECONDS.observe(time.perf_counter() - started, self.name, command_label(uri))
+        if uri in self.subscribe_uris:
+            self._update_state(uri, json.loads(response))
+        return response
+
+    async def send_command(self, command_name, uri, payload, read_only=False, timeout=None):
+        """Отправка команды на телевизор.
+
+        payload — dict или уже сериализованная JSON-строка. Для read_only команд
+        одинаковый запрос, уже ожидающий ответа, повторно не отправляется: новый
+        вызов получает тот же результат.
+
+        timeout — сколько секунд ждать ответа (по умолчанию command_timeout). По его
+        истечении TVTimeoutError: запрос снимается с ожидания и освобождает место в
+        очереди, поздний ответ телевизора отбрасывается.
+        """
+        try:
+            deadline = self._deadline(timeout)
+            command = self._command(command_name, uri, payload, read_only, deadline)
+            if capture.recorder is None:
+                return await command
+            return await self._recorded(command, uri, payload, read_only)
+        except TVTimeoutError:
+            metrics.TV_COMMAND_TIMEOUTS.inc(self.name, command_label(uri))
+            raise
+
+    def _deadline(self, timeout):
+        """Срок ответа по часам цикла событий; TVTimeoutError, если времени уже не осталось."""
+        timeout = self.command_timeout if timeout is None else timeout
+        if timeout <= 0:
+            raise TVTimeoutError("Истёк срок запроса до отправки команды")
+        return asyncio.get_running_loop().time() + timeout
+
+    @staticmethod
+    async def _until(awaitable, deadline):
+        """Ожидание не дольше срока deadline; по его истечении ожидание отменяется."""
+        try:
+            async with asyncio.timeout_at(deadline):
+                return await awaitable
+        except TimeoutError:
+            raise TVTimeoutError("Телевизор не ответил вовремя") from None
+
+    async def _recorded(self, awaitable, uri, payload, read_only, began=None):
+        """Ожидание ответа с записью команды в файл трафика; began — perf_counter отправки."""
+        started = time.time()
+        if began is None:
+            began = time.perf_counter()
+        else:
+            started -= time.perf_counter() - began
+        try:
+            response = await awaitable
+        except Exception as e:
+            capture.record(self.name, uri, encode_payload(payload), read_only, started, time.perf_counter() - began,
+                           error=str(e) or type(e).__name__)
+            raise
+        capture.record(self.name, uri, encode_payload(payload), read_only, started, time.perf_counter() - began,
+                       response=response)
+        return response
+
+    async def _command(self, command_name, uri, payload, read_only, deadline):
+        if not read_only:
+            return await self._until(self._send(command_name, uri, payload, PRIORITY_CONTROL, deadline), deadline)
+
+        payload = encode_payload(payload)
+        key = (uri, payload)
+        task = self.inflight.get(key)
+        if task is None:
+            # Срок общего запроса — срок последнего из ждущих: он отменяется, когда уходит
+            # последний вызывающий, а не по сроку первого. Поэтому и посреднику срок не передаётся
+            task = asyncio.create_task(self._send(command_name, uri, payload, PRIORITY_READ))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self._read_done(key, task))
+        else:
+            metrics.TV_SHARED_READS.inc(self.name, command_label(uri))
+        self.read_waiters[task] = self.read_waiters.get(task, 0) + 1
+        try:
+            # shield: отмена или истёкший срок одного вызывающего не отменяет запрос для остальных
+            return await self._until(asyncio.shield(task), deadline)
+        finally:
+            self.read_waiters[task] -= 1
+            if not self.read_waiters[task]:
+                del self.read_waiters[task]
+                task.cancel()
+
+    def _read_done(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Все вызывающие могли уйти по своему сроку: ошибку общего запроса больше некому забрать
+        if not task.cancelled():
+            task.exception()
+
+    async def _send(self, command_name, uri, payload, priority, deadline=None):
+        await self._ensure_connected()
+
+        websocket = self.websocket
+        try:
+            request = await self._dispatch(uri, payload, priority, deadline)
+            return await self._response(request, uri)
         except websockets.exceptions.ConnectionClosed:
-            logging.warning("Соединение с WebSocket закрыто. Переподключение...")
-            self.connected = False
-            await self.connect()
-            # Повторная попытка отправить команду после переподключения
-            return await self.send_command(command_name, uri, payload)
+            logging.warning("Соединение с WebSocket закрыто. Повтор после переподключения...")
+            if self.websocket is websocket:
+                self.connected = False
+        except TVBusyError:
+            # Переполненная очередь — ожидаемая перегрузка, она видна по ответам 429
+            raise
         except Exception as e:
-            logging.error(f"Ошибка при отправке команды: {e}")
+            logging.error("Ошибка при отправке команды %s: %s", command_label(uri), e)
             raise
 
+        # Одна повторная попытка: переподключение ведёт фоновый супервизор
+        await self._ensure_connected()
+        request = await self._dispatch(uri, payload, priority, deadline)
+        return await self._response(request, uri)
+
+    async def _pipelined_response(self, request, uri, payload, deadline):
+        response = self._until(self._response(request, uri), deadline)
+        if capture.recorder is not None:
+            response = self._recorded(response, uri, payload, False, request[2])
+        return await response
+
+    async def send_pipelined(self, commands, timeout=None):
+        """Отправка нескольких команд подряд без ожидания ответов.
 
-tv_client = LGWebOSClient()
+        Кадры уходят на телевизор в заданном порядке; ответ каждой команды ждётся сразу
+        после отправки её кадра, поэтому слоты планировщика освобождаются по мере ответов
+        и пачка больше max_in_flight не ждёт сама себя. Возвращает список ответов или исключений в порядке команд; timeout —
+        общий срок для всех команд, как в send_command.
+        """
+        deadline = self._deadline(timeout)
+        await self._until(self._ensure_connected(), deadline)
+
+        requests, waiters = [], []
+        try:
+            for command_name, uri, payload in commands:
+                try:
+                    request = await self._until(self._dispatch(uri, payload, PRIORITY_CONTROL, deadline), deadline)
+                    requests.append(request)
+                    waiters.append(asyncio.create_task(self._pipelined_response(request, uri, payload, deadline)))
+                except Exception as e:
+                    failed = asyncio.get_running_loop().create_future()
+                    failed.set_exception(e)
+                    waiters.append(failed)
+            responses = await asyncio.gather(*waiters, return_exceptions=True)
+        except BaseException:
+            # Вызывающий отменён во время отправки или ожидания ответов: отправленные
+            # команды снимаются с ожидания. Задача ожидания могла не успеть начаться,
+            # поэтому отменяются сами Future ответов — они и освобождают слоты
+            for request in requests:
+                request[1].cancel()
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            raise
+        for (command_name, uri, payload), response in zip(commands, responses):
+            if isinstance(response, TVTimeoutError):
+                metrics.TV_COMMAND_TIMEOUTS.inc(self.name, command_label(uri))
+        return responses
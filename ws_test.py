@@ -1,9 +1,12 @@
+import argparse
 import asyncio
 import json
-import websockets
 import logging
+import random
+
+import websockets
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+from all_commands import commands
 
 HOST = "localhost"
 PORT = 3000
@@ -12,100 +15,334 @@ tv_state = {
     "power": True,
     "volume": 20,
     "mute": False,
-    "channel": 1
+    "channel": 1,
+    "app": "com.webos.app.livetv",
+    "input": "HDMI_1",
+    "sound_output": "tv_speaker",
+    "screen": True
+}
+
+# Поведение мок-телевизора; меняется аргументами командной строки
+config = {
+    # Задержка ответа и её разброс, секунды
+    "latency": 0.0,
+    "jitter": 0.0,
+    # Вероятность оборвать соединение вместо ответа
+    "drop_rate": 0.0,
+    # Вероятность не ответить на запрос вовсе
+    "silent_rate": 0.0,
+    # Поведение после turnOff: "active" — отвечает только состоянием питания,
+    # "off" — закрывает соединения и не принимает новые
+    "standby": "active",
+    # Через сколько секунд телевизор сам выходит из standby (0 — никогда)
+    "wake_after": 0.0,
+    "channels": 200,
+    "apps": 50
 }
 
+# Подписки клиентов: uri -> список (websocket, id подписки)
+subscribers = {}
+clients = set()
+
+POWER_URI = "ssap://com.webos.service.tvpower/power/getPowerState"
+AUDIO_URI = "ssap://audio/getStatus"
+APP_URI = "ssap://com.webos.applicationManager/getForegroundAppInfo"
+
+
+def channel_list():
+    return [
+        {"channelId": str(i), "channelNumber": str(i), "channelName": f"Канал {i}"}
+        for i in range(1, config["channels"] + 1)
+    ]
+
+
+def app_list():
+    return [
+        {"id": f"com.mock.app{i}", "title": f"Приложение {i}", "icon": f"http://{HOST}/icons/{i}.png"}
+        for i in range(1, config["apps"] + 1)
+    ]
+
+
+def state_payload(uri):
+    """Payload ответа на запрос/подписку состояния."""
+    if uri == POWER_URI:
+        return {"returnValue": tv_state["power"], "state": "Active" if tv_state["power"] else "Active Standby"}
+    if uri == AUDIO_URI:
+        return {"volume": tv_state["volume"], "mute": tv_state["mute"]}
+    if uri == APP_URI:
+        return {"returnValue": True, "appId": tv_state["app"]}
+    return None
+
+
+def set_volume(payload):
+    if isinstance(payload.get("volume"), int):
+        tv_state["volume"] = max(0, min(100, payload["volume"]))
+    return [AUDIO_URI]
+
+
+def step_volume(step):
+    tv_state["volume"] = max(0, min(100, tv_state["volume"] + step))
+    return [AUDIO_URI]
+
+
+def set_mute(payload):
+    tv_state["mute"] = bool(payload.get("mute"))
+    return [AUDIO_URI]
+
+
+def set_channel(value):
+    tv_state["channel"] = max(1, min(config["channels"], value))
+    return []
+
+
+def launch(payload):
+    tv_state["app"] = payload.get("id", tv_state["app"])
+    return [APP_URI]
+
+
+def close_app(payload):
+    if payload.get("id") == tv_state["app"]:
+        tv_state["app"] = "com.webos.app.livetv"
+    return [APP_URI]
+
+
+def power(value):
+    tv_state["power"] = value
+    return [POWER_URI]
+
+
+# Команды, меняющие состояние: uri -> функция(payload), возвращающая uri для рассылки подписчикам
+ACTIONS = {
+    "ssap://system/turnOff": lambda payload: power(False),
+    "ssap://system/turnOn": lambda payload: power(True),
+    "ssap://audio/setVolume": set_volume,
+    "ssap://audio/volumeUp": lambda payload: step_volume(1),
+    "ssap://audio/volumeDown": lambda payload: step_volume(-1),
+    "ssap://audio/setMute": set_mute,
+    "ssap://tv/channelUp": lambda payload: set_channel(tv_state["channel"] + 1),
+    "ssap://tv/channelDown": lambda payload: set_channel(tv_state["channel"] - 1),
+    "ssap://tv/openChannel": lambda payload: set_channel(int(payload.get("channelId", tv_state["channel"]))),
+    "ssap://system.launcher/launch": launch,
+    "ssap://com.webos.applicationManager/launch": launch,
+    "ssap://system.launcher/close": close_app,
+    "ssap://system.launcher/open": lambda payload: launch({"id": "com.webos.app.browser"}),
+    "ssap://tv/switchInput": lambda payload: tv_state.update(input=payload.get("inputId", tv_state["input"])) or [],
+    "ssap://audio/changeSoundOutput":
+        lambda payload: tv_state.update(sound_output=payload.get("output", tv_state["sound_output"])) or [],
+    "ssap://com.webos.service.tvpower/power/turnOffScreen": lambda payload: tv_state.update(screen=False) or [],
+    "ssap://com.webos.service.tvpower/power/turnOnScreen": lambda payload: tv_state.update(screen=True) or [],
+}
+
+# Команды чтения: uri -> функция(payload), возвращающая payload ответа
+QUERIES = {
+    POWER_URI: lambda payload: state_payload(POWER_URI),
+    AUDIO_URI: lambda payload: state_payload(AUDIO_URI),
+    APP_URI: lambda payload: state_payload(APP_URI),
+    "ssap://audio/getVolume": lambda payload: {"volume": tv_state["volume"], "muted": tv_state["mute"]},
+    "ssap://tv/getCurrentChannel": lambda payload: {
+        "channelId": str(tv_state["channel"]), "channelNumber": str(tv_state["channel"])
+    },
+    "ssap://tv/getChannelList": lambda payload: {"channelList": channel_list()},
+    "ssap://com.webos.applicationManager/listApps": lambda payload: {"apps": app_list()},
+    "ssap://com.webos.applicationManager/listLaunchPoints": lambda payload: {"launchPoints": app_list()},
+    "ssap://tv/getExternalInputList": lambda payload: {
+        "devices": [{"id": f"HDMI_{i}", "label": f"HDMI {i}"} for i in range(1, 5)]
+    },
+    "ssap://api/getServiceList": lambda payload: {
+        "services": [{"name": uri.split("/")[2], "version": 1} for _, uri, _ in commands]
+    },
+    "ssap://com.webos.service.apiadapter/audio/getSoundOutput": lambda payload: {
+        "soundOutput": tv_state["sound_output"]
+    },
+    "ssap://system/getSystemInfo": lambda payload: {"modelName": "MOCK-TV", "receiverType": "dvb"},
+    "ssap://com.webos.service.update/getCurrentSWInformation": lambda payload: {
+        "product_name": "webOSTV 5.0", "major_ver": "05", "minor_ver": "00.00"
+    },
+    "ssap://settings/getSystemSettings": lambda payload: {
+        "category": payload.get("category"), "settings": {key: "50" for key in payload.get("keys", [])}
+    },
+    "ssap://com.webos.service.networkinput/getPointerInputSocket": lambda payload: {
+        "socketPath": f"ws://{HOST}:{PORT}/pointer"
+    },
+}
+
+# Остальные команды каталога просто подтверждаются
+KNOWN_URIS = {uri for _, uri, _ in commands} | set(ACTIONS) | set(QUERIES)
+
+
+async def notify(uri):
+    """Рассылка нового состояния подписчикам."""
+    for websocket, subscription_id in list(subscribers.get(uri, [])):
+        try:
+            await websocket.send(json.dumps({
+                "type": "response",
+                "id": subscription_id,
+                "payload": state_payload(uri)
+            }))
+        except websockets.exceptions.ConnectionClosed:
+            subscribers[uri].remove((websocket, subscription_id))
+
+
+def unsubscribe(websocket):
+    for uri, items in subscribers.items():
+        subscribers[uri] = [item for item in items if item[0] is not websocket]
+
+
+async def enter_standby():
+    """Выключение: в режиме off телевизор пропадает из сети до пробуждения."""
+    if config["standby"] == "off":
+        for websocket in list(clients):
+            await websocket.close()
+    if config["wake_after"]:
+        await asyncio.sleep(config["wake_after"])
+        power(True)
+        logging.info("📺 Телевизор вышел из standby")
+        await notify(POWER_URI)
+
+
+async def handle_request(websocket, data):
+    """Обработка одного запроса с имитацией задержки и сбоев."""
+    delay = config["latency"] + random.uniform(-config["jitter"], config["jitter"])
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    if random.random() < config["silent_rate"]:
+        logging.debug(f"🤐 Запрос оставлен без ответа: {data.get('id')}")
+        return
+    if random.random() < config["drop_rate"]:
+        logging.info("💥 Соединение оборвано")
+        await websocket.close()
+        return
+
+    msg_type = data.get("type")
+    uri = data.get("uri")
+    payload = data.get("payload") or {}
+
+    def response(body):
+        return json.dumps({"type": "response", "id": data.get("id"), "payload": body})
+
+    def error(message):
+        return json.dumps({"type": "error", "id": data.get("id"), "error": message, "payload": {"message": message}})
+
+    # В standby отвечаем только состоянием питания
+    if not tv_state["power"] and uri not in (POWER_URI, "ssap://system/turnOn"):
+        await websocket.send(error("TV is in standby"))
+        return
+
+    # Подписка на изменения состояния
+    if msg_type == "subscribe" and state_payload(uri) is not None:
+        subscribers.setdefault(uri, []).append((websocket, data.get("id")))
+        await websocket.send(response(state_payload(uri)))
+        logging.debug(f"🔔 Подписка на {uri}")
+
+    elif uri in QUERIES:
+        await websocket.send(response(QUERIES[uri](payload)))
+
+    elif uri in ACTIONS:
+        changed = ACTIONS[uri](payload)
+        await websocket.send(response({"returnValue": True}))
+        for state_uri in changed:
+            await notify(state_uri)
+        if uri == "ssap://system/turnOff":
+            logging.info("📴 Телевизор выключен")
+            asyncio.create_task(enter_standby())
+
+    elif uri in KNOWN_URIS:
+        await websocket.send(response({"returnValue": True}))
+
+    else:
+        logging.warning(f"⚠️ Неизвестная команда: {uri}")
+        await websocket.send(json.dumps({
+            "type": "error",
+            "id": data.get("id"),
+            "payload": {"message": "Unknown command"}
+        }))
+
+
+async def handle_pointer(websocket):
+    """Сокет ввода: текстовые сообщения вида type:button\nname:UP\n\n без ответов."""
+    async for message in websocket:
+        fields = dict(line.split(":", 1) for line in message.strip().splitlines() if ":" in line)
+        logging.debug(f"🖱 Ввод: {fields}")
+        if fields.get("type") == "button" and fields.get("name") in ("VOLUMEUP", "VOLUMEDOWN"):
+            await notify(*step_volume(1 if fields["name"] == "VOLUMEUP" else -1))
+
+
 async def handle_client(websocket):
+    request = getattr(websocket, "request", None)
+    if getattr(request, "path", getattr(websocket, "path", "/")) == "/pointer":
+        await handle_pointer(websocket)
+        return
+
+    # Выключенный в режиме off телевизор не принимает подключения
+    if not tv_state["power"] and config["standby"] == "off":
+        await websocket.close()
+        return
+
     logging.info(f"🔌 Клиент подключен: {websocket.remote_address}")
+    clients.add(websocket)
+    tasks = set()
 
     try:
         async for message in websocket:
             data = json.loads(message)
-            logging.info(f"📥 Получено от клиента: {data}")
-
-            msg_type = data.get("type")
-            uri = data.get("uri")
+            logging.debug(f"📥 Получено от клиента: {data}")
 
             # Ответ на регистрацию
-            if msg_type == "register":
+            if data.get("type") == "register":
                 response = {
                     "type": "registered",
+                    "id": data.get("id"),
                     "payload": {
                         "client-key": "mock-client-key"
                     }
                 }
                 await websocket.send(json.dumps(response))
                 logging.info("✅ Ответ на регистрацию отправлен")
+                continue
 
-            # Получение состояния питания
-            elif uri == "ssap://com.webos.service.tvpower/power/getPowerState":
-                await websocket.send(json.dumps({
-                    "type": "response",
-                    "id": data.get("id"),
-                    "payload": {
-                        "returnValue": tv_state["power"]
-                    }
-                }))
-                logging.info(f"⚡ Состояние питания: {tv_state['power']}")
-
-            # Выключение телевизора
-            elif uri == "ssap://system/turnOff":
-                tv_state["power"] = False
-                await websocket.send(json.dumps({
-                    "type": "response",
-                    "id": data.get("id"),
-                    "payload": {"returnValue": True}
-                }))
-                logging.info("📴 Телевизор выключен")
-
-            # Включение телевизора
-            elif uri == "ssap://system/turnOn":
-                tv_state["power"] = True
-                await websocket.send(json.dumps({
-                    "type": "response",
-                    "id": data.get("id"),
-                    "payload": {"returnValue": True}
-                }))
-                logging.info("📺 Телевизор включен")
-
-            # Получение статуса аудио
-            elif uri == "ssap://audio/getStatus":
-                await websocket.send(json.dumps({
-                    "type": "response",
-                    "id": data.get("id"),
-                    "payload": {
-                        "volume": tv_state["volume"],
-                        "mute": tv_state["mute"]
-                    }
-                }))
-                logging.info("🔊 Отправлен статус звука")
-
-            # Установка громкости
-            elif uri == "ssap://audio/setVolume":
-                new_volume = data.get("payload", {}).get("volume")
-                if isinstance(new_volume, int):
-                    tv_state["volume"] = new_volume
-                    logging.info(f"🔈 Громкость установлена на {new_volume}")
-                await websocket.send(json.dumps({
-                    "type": "response",
-                    "id": data.get("id"),
-                    "payload": {"returnValue": True}
-                }))
-
-            else:
-                logging.warning(f"⚠️ Неизвестная команда: {uri}")
-                await websocket.send(json.dumps({
-                    "type": "error",
-                    "id": data.get("id"),
-                    "payload": {"message": "Unknown command"}
-                }))
+            # Запросы обрабатываются параллельно, ответы могут приходить не по порядку
+            task = asyncio.create_task(handle_request(websocket, data))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
     except websockets.exceptions.ConnectionClosed:
+        pass
+    finally:
+        clients.discard(websocket)
+        unsubscribe(websocket)
         logging.info("❌ Клиент отключен")
 
-async def start_server():
-    server = await websockets.serve(handle_client, HOST, PORT)
-    logging.info(f"🌐 Сервер WebSocket запущен на ws://{HOST}:{PORT}")
+
+async def start_server(host=HOST, port=PORT):
+    server = await websockets.serve(handle_client, host, port)
+    logging.info(f"🌐 Сервер WebSocket запущен на ws://{host}:{port}")
     await server.wait_closed()
 
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Мок-телевизор LG webOS")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--latency", type=float, default=config["latency"], help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=config["jitter"], help="разброс задержки, с")
+    parser.add_argument("--drop-rate", type=float, default=config["drop_rate"],
+                        help="вероятность оборвать соединение на запросе")
+    parser.add_argument("--silent-rate", type=float, default=config["silent_rate"],
+                        help="вероятность не ответить на запрос")
+    parser.add_argument("--standby", choices=("active", "off"), default=config["standby"],
+                        help="поведение после turnOff")
+    parser.add_argument("--wake-after", type=float, default=config["wake_after"],
+                        help="через сколько секунд выйти из standby (0 — никогда)")
+    parser.add_argument("--channels", type=int, default=config["channels"])
+    parser.add_argument("--apps", type=int, default=config["apps"])
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    asyncio.run(start_server())
+    args = parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [%(levelname)s] %(message)s")
+    HOST, PORT = args.host, args.port
+    for key in config:
+        config[key] = getattr(args, key)
+    asyncio.run(start_server(args.host, args.port))